@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Time ExcelProcessor's font/fill filtering per cell and per cell style on a synthetic styled workbook.
+
+The workbook mixes black, red and blue fonts with no, white and yellow fills
+across several formatted columns, so only some numbers are eligible. For each
+mode it reports the filter alone (over the eMedical No. cells, read once) and
+the whole extraction; both modes must return the same numbers.
+
+    python benchmarks/bench_extract.py --rows 100000 --repeat 3
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font, PatternFill
+
+from emedical import ExcelProcessor
+
+PREFIXES = ["HAP", "TRN", "NZER", "IME", "UCI", "CEAC"]
+FONTS = [Font(color="FF000000"), Font(color="FFFF0000"), Font(color="FF000000", bold=True), Font(color="FF0000FF")]
+FILLS = [PatternFill(), PatternFill("solid", fgColor="FFFFFFFF"), PatternFill("solid", fgColor="FFFFFF00")]
+
+
+def write_workbook(path, rows, columns):
+    """Write `rows` applicants with `columns` extra formatted columns after the eMedical No. column."""
+    wb = Workbook()
+    ws = wb.active
+    ws.append(["Name", "eMedical No."] + [f"Note {i}" for i in range(columns)])
+    for i in range(rows):
+        ws.append([f"Applicant {i}", f"{PREFIXES[i % len(PREFIXES)]}{100000 + i}"] + [i * 7 % 13] * columns)
+        for column in range(1, columns + 3):
+            cell = ws.cell(row=i + 2, column=column)
+            cell.font = FONTS[i % len(FONTS)]
+            cell.fill = FILLS[i % 7 % len(FILLS)]
+    wb.save(path)
+
+
+def time_filter(path, cache_styles, repeat):
+    """Return the best seconds of filtering the eMedical No. column's cells, without reading the file."""
+    wb = load_workbook(path, read_only=True, data_only=True)
+    try:
+        cells = [row[1] for row in wb.active.iter_rows(min_row=2)]
+        processor = ExcelProcessor()
+        processor.cache_styles = cache_styles
+        best = None
+        for _ in range(repeat):
+            is_eligible = processor.eligibility_filter()
+            start = perf_counter()
+            for cell in cells:
+                is_eligible(cell)
+            seconds = perf_counter() - start
+            best = seconds if best is None else min(best, seconds)
+        return best
+    finally:
+        wb.close()
+
+
+def time_extract(path, cache_styles, repeat):
+    """Return (numbers, best seconds) of extracting the workbook `repeat` times."""
+    processor = ExcelProcessor()
+    processor.cache_styles = cache_styles
+    best = None
+    for _ in range(repeat):
+        start = perf_counter()
+        numbers = processor.extract_emedical_no(path)
+        seconds = perf_counter() - start
+        best = seconds if best is None else min(best, seconds)
+    return numbers, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--columns", type=int, default=8, help="extra formatted columns per row")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    path = Path(tempfile.mkdtemp()) / "styled.xlsx"
+    start = perf_counter()
+    write_workbook(path, args.rows, args.columns)
+    print(f"Wrote {args.rows} rows x {args.columns + 2} columns in {perf_counter() - start:.1f}s")
+
+    results = {}
+    print(f"{'mode':<10}{'numbers':>9}{'filter s':>10}{'extract s':>11}{'rows/s':>10}")
+    for mode, cache_styles in (("per cell", False), ("per style", True)):
+        filter_seconds = time_filter(path, cache_styles, args.repeat)
+        numbers, seconds = time_extract(path, cache_styles, args.repeat)
+        results[mode] = (numbers, filter_seconds, seconds)
+        print(f"{mode:<10}{len(numbers):>9}{filter_seconds:>10.3f}{seconds:>11.2f}{args.rows / seconds:>10.0f}")
+
+    (per_cell, cell_filter, cell_extract), (per_style, style_filter, style_extract) = results.values()
+    print(f"Speedup: filter {cell_filter / style_filter:.1f}x, extraction {cell_extract / style_extract:.2f}x, "
+          f"identical results: {per_cell == per_style}")
+    if per_cell != per_style:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
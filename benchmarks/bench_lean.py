@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Compare bytes received and wall time per case with and without lean browsing.
+
+Every case listed is submitted once per mode, so run this against a test
+account or a local stand-in for eMedical, never against live cases.
+
+    python benchmarks/bench_lean.py --url http://127.0.0.1:8502/eMedUI/eMedical HAP001 CEAC002
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from emedical import (
+    EMEDICAL_URL, PAGE_LOAD_STRATEGIES, EmedicalWebAutomator, EmedicalWorkflowManager, ExcelProcessor
+)
+
+
+def run_mode(args, lean, page_load_strategy):
+    """Process every case in one browser session and return the mean (KB, blocked, seconds) per case."""
+    automator = EmedicalWebAutomator(args.url, lean=lean, page_load_strategy=page_load_strategy)
+    automator.track_network = True
+    manager = EmedicalWorkflowManager(ExcelProcessor(), automator)
+    if not automator.login(args.user, args.password, headless=args.headless):
+        sys.exit("Login failed")
+    try:
+        for emed_no in args.emed_nos:
+            automator.automate_cxr_exam(emed_no, manager._get_country(emed_no))
+    finally:
+        automator.quit()
+    return automator.network.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("emed_nos", nargs="+", help="eMedical No. to process in each mode")
+    parser.add_argument("--url", default=EMEDICAL_URL)
+    parser.add_argument("--user", default=os.environ.get("EMEDICAL_USER", ""))
+    parser.add_argument("--password", default=os.environ.get("EMEDICAL_PASSWORD", ""))
+    parser.add_argument("--page-load-strategy", choices=PAGE_LOAD_STRATEGIES, default="eager",
+                        help="strategy used in lean mode")
+    parser.add_argument("--headless", action="store_true")
+    args = parser.parse_args()
+
+    normal = run_mode(args, lean=False, page_load_strategy="normal")
+    lean = run_mode(args, lean=True, page_load_strategy=args.page_load_strategy)
+
+    print(f"{'mode':<10}{'KB/case':>10}{'blocked':>10}{'s/case':>10}")
+    print(f"{'normal':<10}{normal[0]:>10.0f}{normal[1]:>10.1f}{normal[2]:>10.2f}")
+    print(f"{'lean':<10}{lean[0]:>10.0f}{lean[1]:>10.1f}{lean[2]:>10.2f}")
+    print(f"{'saved':<10}{normal[0] - lean[0]:>10.0f}{'':>10}{normal[2] - lean[2]:>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Count DOM lookups per case with Helium text matching, the compiled LocatorRegistry, and compiled lookups plus fast fill.
+
+Every case listed is submitted three times (once per mode), so run this against a
+test account or a local stand-in for eMedical, never against live cases.
+
+    python benchmarks/bench_locators.py --url http://127.0.0.1:8502/eMedUI/eMedical HAP001 CEAC002
+"""
+import argparse
+import os
+import sys
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from emedical import EMEDICAL_URL, EmedicalWebAutomator, EmedicalWorkflowManager, ExcelProcessor
+
+
+def run_mode(args, compiled, fast_fill):
+    """Process every case in one browser session and return (lookups, seconds) per case."""
+    automator = EmedicalWebAutomator(args.url)
+    automator.locators.compiled = compiled
+    automator.fast_fill = fast_fill
+    manager = EmedicalWorkflowManager(ExcelProcessor(), automator)
+    if not automator.login(args.user, args.password, headless=args.headless):
+        sys.exit("Login failed")
+
+    results = []
+    try:
+        for emed_no in args.emed_nos:
+            before = automator.locators.lookups
+            start = perf_counter()
+            automator.automate_cxr_exam(emed_no, manager._get_country(emed_no))
+            results.append((automator.locators.lookups - before, perf_counter() - start))
+    finally:
+        automator.quit()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("emed_nos", nargs="+", help="eMedical No. to process in each mode")
+    parser.add_argument("--url", default=EMEDICAL_URL)
+    parser.add_argument("--user", default=os.environ.get("EMEDICAL_USER", ""))
+    parser.add_argument("--password", default=os.environ.get("EMEDICAL_PASSWORD", ""))
+    parser.add_argument("--headless", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'mode':<10}{'case':>6}{'lookups':>10}{'seconds':>10}")
+    for mode, compiled, fast_fill in (("helium", False, False), ("compiled", True, False), ("fast fill", True, True)):
+        results = run_mode(args, compiled, fast_fill)
+        for case, (lookups, seconds) in enumerate(results, start=1):
+            print(f"{mode:<10}{case:>6}{lookups:>10}{seconds:>10.2f}")
+        # The first case compiles the selectors; later cases show the steady state
+        steady = results[1:] or results
+        print(f"{mode:<10}{'mean':>6}{sum(r[0] for r in steady) / len(steady):>10.1f}"
+              f"{sum(r[1] for r in steady) / len(steady):>10.2f}")
+
+
+if __name__ == "__main__":
+    main()
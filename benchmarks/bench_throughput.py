@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+End-to-end throughput benchmark of EmedicalWorkflowManager against the local mock eMedical server.
+
+For every combination of scheduling policy, worker count, tabs per browser and
+wait strategy it processes a synthetic batch and reports cases per minute,
+success count, exams submitted from a page showing another case, per-step
+latency (p50/p95 from the run's trace) and peak memory.
+
+    python benchmarks/bench_throughput.py --cases 40 --workers 1 2 4 --latency 0.1
+    python benchmarks/bench_throughput.py --policies fifo grouped --workers 2
+    python benchmarks/bench_throughput.py --workers 1 --tabs 1 2 4 --shared-case-state
+"""
+import argparse
+import sys
+import tempfile
+from pathlib import Path
+from time import perf_counter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from emedical import (
+    WAIT_SETTINGS, SCHEDULING_POLICIES, DEFAULT_SCHEDULING_POLICY, EmedicalWebAutomator, EmedicalWorkflowManager, ExcelProcessor
+)
+from mock_server import MockEmedical, start_server
+from tests.workbooks import write_workbook
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+PREFIXES = ["HAP", "TRN", "NZER", "IME", "UCI", "CEAC"]
+# Poll intervals per wait strategy; "helium" matches Helium's own wait_until default
+WAIT_STRATEGIES = {
+    "event": None,
+    "helium": {name: (timeout, 0.5) for name, (timeout, _) in WAIT_SETTINGS.items()},
+}
+STEPS = ("login", "search", "manage_case", "findings", "review", "declaration", "submit", "case")
+
+
+class ResultCollector:
+    """
+    Minimal workflow callbacks that only count results.
+    """
+    def __init__(self):
+        self.succeeded = 0
+        self.failed = 0
+
+    def register(self, manager):
+        manager.set_gui_callbacks(
+            update_status=lambda msg: None,
+            update_emed_no_listbox=lambda emed_no, index=None, highlight=False: None,
+            update_success_listbox=lambda emed_no: setattr(self, "succeeded", self.succeeded + 1),
+            update_failure_listbox=lambda emed_no: setattr(self, "failed", self.failed + 1),
+            update_counts=lambda: None,
+            clear_listboxes=lambda: None
+        )
+
+
+def write_batch(path, cases):
+    """Write a workbook with `cases` eMedical No. spread over every country."""
+    write_workbook(path, [f"{PREFIXES[i % len(PREFIXES)]}{100000 + i}" for i in range(cases)])
+
+
+def peak_memory_mb():
+    """Return (this process, largest finished child) peak RSS in MB, or None where unsupported."""
+    if resource is None:
+        return None, None
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+            resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale)
+
+
+def run(url, excel_path, workers, tabs, wait_settings, headless, policy):
+    automator = EmedicalWebAutomator(url, wait_settings)
+    automator.configure_browser(pipeline_depth=tabs)
+    manager = EmedicalWorkflowManager(ExcelProcessor(), automator)
+    manager.scheduling_policy = policy
+    collector = ResultCollector()
+    collector.register(manager)
+    start = perf_counter()
+    manager.start_workflow("bench", "bench", excel_path, headless, close_browser=True, workers=workers)
+    return collector, perf_counter() - start, automator.tracer.summary()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cases", type=int, default=24)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--tabs", type=int, nargs="+", default=[1], help="cases in flight per browser")
+    parser.add_argument("--policies", nargs="+", choices=SCHEDULING_POLICIES, default=[DEFAULT_SCHEDULING_POLICY])
+    parser.add_argument("--strategies", nargs="+", choices=WAIT_STRATEGIES, default=list(WAIT_STRATEGIES))
+    parser.add_argument("--latency", type=float, default=0.05, help="mock server latency per request")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--shared-case-state", action="store_true",
+                        help="mock server keeps the selected case per session rather than per tab")
+    parser.add_argument("--show-browser", action="store_true")
+    args = parser.parse_args()
+
+    mock = MockEmedical(args.latency, args.jitter, args.failure_rate, seed=0, shared_case_state=args.shared_case_state)
+    server, url = start_server(mock)
+    excel_path = Path(tempfile.mkdtemp()) / "batch.xlsx"
+    write_batch(excel_path, args.cases)
+
+    header = f"{'policy':<9}{'workers':>7}{'tabs':>5} {'strategy':<8}{'cases/min':>10}{'ok':>5}{'fail':>5}{'wrong':>6}"
+    header += "".join(f"{step[:8]:>17}" for step in STEPS) + f"{'py MB':>8}{'chrome MB':>10}"
+    print(f"{'':>53}" + "".join(f"{'p50/p95 (s)':>17}" for _ in STEPS))
+    print(header)
+    try:
+        for policy in args.policies:
+            for strategy in args.strategies:
+                for workers in args.workers:
+                    for tabs in args.tabs:
+                        mock.reset()
+                        collector, seconds, steps = run(url, excel_path, workers, tabs, WAIT_STRATEGIES[strategy],
+                                                        not args.show_browser, policy)
+                        own_mb, child_mb = peak_memory_mb()
+                        row = f"{policy:<9}{workers:>7}{tabs:>5} {strategy:<8}{collector.succeeded / seconds * 60:>10.1f}"
+                        row += f"{collector.succeeded:>5}{collector.failed:>5}{mock.stats['wrong_case']:>6}"
+                        for step in STEPS:
+                            _, p50, p95, _ = steps.get(step, (0, 0.0, 0.0, 0.0))
+                            row += f"{p50:>11.2f}/{p95:<5.2f}"
+                        row += f"{own_mb or 0:>8.0f}{child_mb or 0:>10.0f}"
+                        print(row, flush=True)
+    finally:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
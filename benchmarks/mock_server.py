@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+Local stand-in for the eMedical site, serving the page flow EmedicalWebAutomator drives:
+logon, Case search, Manage Case, the 502 findings pages of each country, the
+declaration with its submit alert, and Success.
+
+    python benchmarks/mock_server.py --port 8502 --latency 0.2 --failure-rate 0.02
+    EMEDICAL_URL=http://127.0.0.1:8502/eMedUI/eMedical python main.py
+
+Every eMedical No. with a known prefix is an existing case whose 502 exam is
+pending until it is submitted. GET /status returns the case states as JSON.
+
+Each browser tab of a session has its own page and selected case, like a ZK
+desktop, so several tabs can work on different cases of one login. With
+--shared-case-state the selected case is kept per session instead: a search in
+one tab switches the case under every other tab, and /status counts the exams
+submitted from a page showing another case as "wrong_case".
+"""
+import argparse
+import html
+import json
+import random
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import sleep, time
+from urllib.parse import parse_qs, urlparse
+
+BASE_PATH = "/eMedUI/eMedical"
+PREFIX_TO_COUNTRY = {
+    "HAP": "AU", "TRN": "AU", "NZER": "NZ", "NZHR": "NZ",
+    "IME": "CA", "UMI": "CA", "UCI": "CA", "CEAC": "US",
+}
+TB_QUESTION = "7. Are there strong suspicions of active Tuberculosis (TB)?"
+DECLARATION = "I declare that the chest X-ray examination report is a true and correct record of my findings."
+GRADE_A = ("A - No evidence of active TB, or changes consistent with old or inactive TB, "
+           "or changes suggestive of other significant diseases identified.")
+DETAILED_QUESTIONS = [
+    ("q1", "1. Heart size and shape"),
+    ("q2", "2. Lung fields"),
+    ("q3", "3. Pleura and diaphragm"),
+    ("q4", "4. Bony thorax"),
+    ("q5", "5. Mediastinum"),
+]
+# Form values each country's exam must carry when it is submitted
+REQUIRED_FIELDS = {
+    "US": {"finding": "normal", "declare": "on"},
+    "AU": dict({key: "normal" for key, _ in DETAILED_QUESTIONS}, q6="absent", q7="no", declare="on", grade="A"),
+}
+REQUIRED_FIELDS["NZ"] = REQUIRED_FIELDS["AU"]
+REQUIRED_FIELDS["CA"] = dict(REQUIRED_FIELDS["AU"], special="none")
+
+
+def country_of(emed_no):
+    for prefix, country in PREFIX_TO_COUNTRY.items():
+        if emed_no.startswith(prefix):
+            return country
+    return None
+
+
+class MockEmedical:
+    """
+    Session and case state shared by all request handlers.
+    """
+    def __init__(self, latency=0.0, jitter=0.0, failure_rate=0.0, session_ttl=None, submitted_ratio=0.0, seed=None,
+                 shared_case_state=False):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.session_ttl = session_ttl
+        self.submitted_ratio = submitted_ratio
+        self.shared_case_state = shared_case_state
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.sessions = {}
+        self.cases = {}
+        self.stats = {"requests": 0, "injected_failures": 0, "submitted": 0, "rejected": 0, "wrong_case": 0}
+
+    def reset(self):
+        with self.lock:
+            self.sessions.clear()
+            self.cases.clear()
+            self.stats = dict.fromkeys(self.stats, 0)
+
+    def case_status(self, emed_no):
+        """Return 'pending' or 'submitted' for an existing case, None for an unknown number."""
+        if country_of(emed_no) is None:
+            return None
+        with self.lock:
+            if emed_no not in self.cases:
+                self.cases[emed_no] = "submitted" if self.random.random() < self.submitted_ratio else "pending"
+            return self.cases[emed_no]
+
+    def session(self, session_id):
+        with self.lock:
+            session = self.sessions.get(session_id)
+            now = time()
+            if session and self.session_ttl and now - session["seen"] > self.session_ttl:
+                session = None
+            if session is None:
+                session_id = uuid.uuid4().hex
+                session = self.sessions[session_id] = {"id": session_id, "logged_in": False, "tabs": {}}
+            session["seen"] = now
+            return session
+
+    def tab(self, session, tab_id):
+        """Return the page state of one tab of the session; a page load without a known tab id opens a new tab."""
+        with self.lock:
+            if self.shared_case_state:
+                tab_id = "shared"
+            tab = session["tabs"].get(tab_id)
+            if tab is None:
+                tab_id = tab_id if self.shared_case_state else uuid.uuid4().hex[:12]
+                tab = session["tabs"][tab_id] = {
+                    "id": tab_id, "page": "search" if session["logged_in"] else "logon", "case": None, "fields": {}
+                }
+            return tab
+
+
+def radio(name, value, label, fields, checked_default=False):
+    checked = fields.get(name) == value or (checked_default and name not in fields)
+    element_id = f"{name}-{value}"
+    return (f'<span class="z-radio"><input type="radio" id="{element_id}" name="{name}" value="{value}"'
+            f'{" checked" if checked else ""}><label for="{element_id}">{html.escape(label)}</label></span> ')
+
+
+def button(action, label, extra=""):
+    return f'<button type="submit" name="action" value="{action}"{extra}>{html.escape(label)}</button> '
+
+
+def link(tab, target, label):
+    return f'<a href="{BASE_PATH}?tab={tab["id"]}&amp;open={target}">{html.escape(label)}</a>'
+
+
+def render(tab, mock):
+    """Return the HTML body of the tab's current page."""
+    page = tab["page"]
+    fields = tab["fields"]
+    emed_no = tab["case"]
+    country = country_of(emed_no) if emed_no else None
+    # The exam pages show the case ID in an element of its own, as the case details page does;
+    # the verify_case step of pipelined runs looks for it
+    case_id = f"<p>{html.escape(emed_no)}</p>" if emed_no else ""
+
+    if page == "logon":
+        return ('<h2>eMedical</h2>'
+                '<div><label for="uid">User id</label> <input type="text" id="uid" name="user"></div>'
+                '<div><label for="pwd">Password</label> <input type="password" id="pwd" name="password"></div>'
+                + button("logon", "Logon"))
+    if page == "search":
+        return ('<h2>Case search</h2>'
+                + radio("search_by", "hcid", "Using Health Case Identifier", {})
+                + radio("search_by", "client", "Using Client details", {})
+                + '<div><label for="case-id">ID</label> <input type="text" id="case-id" name="id"></div>'
+                + button("reset", "Reset") + button("search", "Search"))
+    if page == "results":
+        if mock.case_status(emed_no) is None:
+            return "<h2>Case search</h2><p>No health cases found</p>" + button("close", "Close")
+        return (f'<h2>Search results</h2><table><tr><th>Health Case Identifier</th><th>Status</th></tr>'
+                f'<tr><td>{html.escape(emed_no)}</td><td>{mock.case_status(emed_no)}</td></tr></table>'
+                '<p>Select: ' + button("all", "All") + button("none", "None") + '</p>'
+                + button("manage", "Manage Case") + button("close", "Close"))
+    if page == "case":
+        body = f"<h2>Pre exam: Health case details</h2>{case_id}<ul>"
+        if mock.case_status(emed_no) == "pending":
+            body += "<li>" + link(tab, "cxr", "502 Chest X-Ray Examination") + "</li>"
+        body += "<li>501 Medical Examination</li></ul>"
+        if tab.get("exam_open"):
+            section = (link(tab, "findings", "Findings") if country == "US"
+                       else link(tab, "detailed", "Detailed radiology findings"))
+            body += f"<div>{section}</div>"
+        return body + button("close", "Close")
+    if page == "findings":
+        return ('<h2>502 Chest X-Ray Examination: Findings</h2>' + case_id +
+                '<table><tr><td>Findings</td><td>' + radio("finding", "normal", "Normal", fields)
+                + radio("finding", "abnormal", "Abnormal", fields) + '</td></tr></table>'
+                + button("next", "Next") + button("close", "Close"))
+    if page == "detailed":
+        rows = "".join(
+            f"<tr><td>{html.escape(question)}</td><td>" + radio(key, "normal", "Normal", fields)
+            + radio(key, "abnormal", "Abnormal", fields) + "</td></tr>"
+            for key, question in DETAILED_QUESTIONS
+        )
+        rows += ("<tr><td>6. Hilar and mediastinal lymphadenopathy</td><td>"
+                 + radio("q6", "absent", "Absent", fields) + radio("q6", "present", "Present", fields) + "</td></tr>")
+        rows += (f"<tr><td>{html.escape(TB_QUESTION)}</td><td>"
+                 + radio("q7", "not_selected", "Not selected", fields, checked_default=True)
+                 + radio("q7", "yes", "Yes", fields) + radio("q7", "no", "No", fields) + "</td></tr>")
+        return ("<h2>502 Chest X-Ray Examination: Detailed radiology findings</h2>" + case_id
+                + f"<h3>Detailed question</h3><table>{rows}</table>" + button("next", "Next") + button("close", "Close"))
+    if page == "special":
+        return ("<h2>Special findings</h2>" + case_id
+                + radio("special", "none", "None of the following are present", fields)
+                + radio("special", "some", "One or more of the following are present", fields)
+                + button("next", "Next") + button("close", "Close"))
+    if page == "review":
+        summary = "".join(f"<tr><td>{html.escape(k)}</td><td>{html.escape(v)}</td></tr>" for k, v in sorted(fields.items()))
+        return ("<h2>502 Chest X-Ray Examination: Review exam details</h2>" + case_id
+                + f"<table>{summary}</table>" + button("next", "Next") + button("close", "Close"))
+    if page == "declaration":
+        if country == "US":
+            body, prepare = "<h2>502 Chest X-Ray Examination: Examiner Declaration</h2>", "Prepare for declaration"
+        else:
+            body, prepare = "<h2>502 Chest X-Ray Examination: Grading &amp; Examiner Declaration</h2>", "Prepare for grading"
+        body += case_id
+        if not tab.get("prepared"):
+            return body + button("prepare", prepare) + button("close", "Close")
+        if country != "US":
+            body += "<div>" + radio("grade", "A", GRADE_A, fields) + radio("grade", "B", "B - Other findings", fields) + "</div>"
+        body += ('<h3>Examiner declaration</h3><div><input type="checkbox" id="declare" name="declare"'
+                 + (" checked" if fields.get("declare") == "on" else "")
+                 + f'><label for="declare">{html.escape(DECLARATION)}</label></div>')
+        return (body + button("submit", "Submit Exam", ' onclick="return confirm(\'Submit this exam?\')"')
+                + button("close", "Close"))
+    if page == "success":
+        return f"<h2>Success</h2><p>Exam submitted for {html.escape(emed_no)}</p>" + button("close", "Close")
+    if page == "rejected":
+        return "<h2>Validation failed</h2><p>Some required answers are missing.</p>" + button("close", "Close")
+    return "<h2>Unknown page</h2>" + button("close", "Close")
+
+
+def handle_action(session, tab, form, mock):
+    """Apply a form POSTed from one tab of the session and move the tab to its next page."""
+    action = form.get("action", "")
+    page = tab["page"]
+    fields = tab["fields"]
+    # Radio and checkbox answers are kept across pages like the real exam form
+    for key, value in form.items():
+        if key not in ("action", "user", "password", "id", "search_by", "tab", "case"):
+            fields[key] = value
+    if page == "declaration" and tab.get("prepared") and "declare" not in form:
+        fields.pop("declare", None)
+
+    if action == "close":
+        tab.update(page="search", case=None, fields={}, exam_open=False, prepared=False)
+    elif page == "logon" and action == "logon":
+        if form.get("user") and form.get("password"):
+            session["logged_in"] = True
+            tab["page"] = "search"
+    elif action == "search":
+        # Taken from any page: with shared case state another tab may have moved on from Case search
+        tab.update(page="results", case=form.get("id", "").strip(), fields={}, exam_open=False, prepared=False)
+    elif page == "results" and action == "manage":
+        tab["page"] = "case"
+    elif page in ("findings", "detailed", "special", "review") and action == "next":
+        country = country_of(tab["case"])
+        if page == "detailed" and country == "CA":
+            tab["page"] = "special"
+        elif page == "review":
+            tab["page"] = "declaration"
+        else:
+            tab["page"] = "review"
+    elif page == "declaration" and action == "prepare":
+        tab["prepared"] = True
+    elif page == "declaration" and action == "submit":
+        required = REQUIRED_FIELDS[country_of(tab["case"])]
+        if all(fields.get(key) == value for key, value in required.items()):
+            with mock.lock:
+                mock.cases[tab["case"]] = "submitted"
+                mock.stats["submitted"] += 1
+                # The page the exam was submitted from showed another case than the one submitted
+                if form.get("case") != tab["case"]:
+                    mock.stats["wrong_case"] += 1
+            tab["page"] = "success"
+        else:
+            mock.stats["rejected"] += 1
+            tab["page"] = "rejected"
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    mock = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def _session(self):
+        cookies = dict(
+            part.strip().split("=", 1) for part in self.headers.get("Cookie", "").split(";") if "=" in part
+        )
+        return self.mock.session(cookies.get("session"))
+
+    def _delay_or_fail(self):
+        """Apply the configured latency; return True if this request should fail."""
+        mock = self.mock
+        with mock.lock:
+            mock.stats["requests"] += 1
+            delay = mock.latency + mock.random.uniform(0, mock.jitter)
+            failed = mock.random.random() < mock.failure_rate
+            if failed:
+                mock.stats["injected_failures"] += 1
+        if delay:
+            sleep(delay)
+        return failed
+
+    def _respond(self, session, tab, body, status=200):
+        hidden = f'<input type="hidden" name="tab" value="{tab["id"]}">'
+        if tab["case"]:
+            hidden += f'<input type="hidden" name="case" value="{html.escape(tab["case"])}">'
+        page = (f'<!DOCTYPE html><html><head><meta charset="utf-8"><title>eMedical</title></head><body>'
+                f'<form method="post" action="{BASE_PATH}">{hidden}{body}</form></body></html>').encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(page)))
+        self.send_header("Set-Cookie", f"session={session['id']}; Path=/")
+        self.end_headers()
+        self.wfile.write(page)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/status":
+            body = json.dumps({"stats": self.mock.stats, "cases": self.mock.cases}).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+        if url.path != BASE_PATH:
+            self.send_error(404)
+            return
+
+        session = self._session()
+        query = parse_qs(url.query)
+        tab = self.mock.tab(session, query.get("tab", [None])[0])
+        if self._delay_or_fail():
+            self._respond(session, tab, "<h2>Service temporarily unavailable</h2>" + button("close", "Close"), 503)
+            return
+        target = query.get("open", [None])[0]
+        if tab["page"] == "case" and target == "cxr":
+            tab["exam_open"] = True
+        elif tab["page"] == "case" and tab.get("exam_open") and target in ("findings", "detailed"):
+            tab["page"] = target
+        self._respond(session, tab, render(tab, self.mock))
+
+    def do_POST(self):
+        if urlparse(self.path).path != BASE_PATH:
+            self.send_error(404)
+            return
+        session = self._session()
+        length = int(self.headers.get("Content-Length", 0))
+        form = {key: values[-1] for key, values in parse_qs(self.rfile.read(length).decode("utf-8")).items()}
+        tab = self.mock.tab(session, form.get("tab"))
+        if self._delay_or_fail():
+            self._respond(session, tab, "<h2>Service temporarily unavailable</h2>" + button("close", "Close"), 503)
+            return
+        handle_action(session, tab, form, self.mock)
+        self._respond(session, tab, render(tab, self.mock))
+
+
+def start_server(mock, host="127.0.0.1", port=0):
+    """Serve the mock in a background thread; return (server, base URL)."""
+    handler = type("BoundMockHandler", (MockHandler,), {"mock": mock})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="mock-emedical", daemon=True).start()
+    return server, f"http://{host}:{server.server_address[1]}{BASE_PATH}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve a local stand-in for the eMedical site.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8502)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds added to every request")
+    parser.add_argument("--jitter", type=float, default=0.0, help="extra random latency, up to this many seconds")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    parser.add_argument("--session-ttl", type=float, help="log sessions out after this many idle seconds")
+    parser.add_argument("--submitted-ratio", type=float, default=0.0, help="fraction of cases already submitted")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--shared-case-state", action="store_true",
+                        help="keep the selected case per session rather than per tab")
+    args = parser.parse_args()
+
+    mock = MockEmedical(args.latency, args.jitter, args.failure_rate, args.session_ttl, args.submitted_ratio, args.seed,
+                        args.shared_case_state)
+    server, url = start_server(mock, args.host, args.port)
+    print(f"Mock eMedical serving at {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
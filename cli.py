@@ -0,0 +1,229 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@author: Hsin-ming Chen
+@license: MIT
+@file: cli.py
+@time: 2025/08/16
+@contact: hsinming.chen@gmail.com
+@software: PyCharm
+
+Headless batch runner for servers and cron; it never imports tkinter.
+
+    EMEDICAL_USER=... EMEDICAL_PASSWORD=... python cli.py clinic.xlsx --workers 4 --json
+    python cli.py clinic.xlsx --profiles accounts.json --workers 2
+    python cli.py --watch D:/exports   # service mode: process new exports until stopped
+
+Exit codes: 0 all cases succeeded, 1 some cases failed, 2 bad arguments or
+credentials, 3 nothing was processed (no numbers read or login failed),
+130 stopped with Ctrl-C.
+"""
+import argparse
+import json
+import os
+import signal
+import sys
+from datetime import datetime
+
+from emedical import (
+    EMEDICAL_URL, DEFAULT_WORKERS, MAX_WORKERS, MAX_PIPELINE_DEPTH, MAX_RETRIES, RECYCLE_AFTER_CASES, CASE_STATUS_TTL, WAIT_SETTINGS, PAGE_LOAD_STRATEGIES, DEFAULT_PAGE_LOAD_STRATEGY,
+    SCHEDULING_POLICIES, DEFAULT_SCHEDULING_POLICY, WATCH_WRITE_BACK_INTERVAL,
+    ExcelProcessor, EmedicalWebAutomator, CheckpointJournal, CaseStatusIndex, ResultWriter, EmedicalWorkflowManager, FormPlans,
+    load_profiles, stop_event
+)
+
+EXIT_OK = 0
+EXIT_FAILURES = 1
+EXIT_USAGE = 2
+EXIT_NOT_PROCESSED = 3
+EXIT_INTERRUPTED = 130
+
+
+class ConsoleReporter:
+    """
+    Workflow callbacks that stream progress to stdout as text or JSON lines.
+    """
+    def __init__(self, as_json=False):
+        self.as_json = as_json
+        self.succeeded = 0
+        self.failed = 0
+
+    def _emit(self, event, **fields):
+        if self.as_json:
+            print(json.dumps({"time": datetime.now().isoformat(timespec='seconds'), "event": event, **fields},
+                             ensure_ascii=False), flush=True)
+        elif event == "status":
+            print(fields["message"], flush=True)
+        elif event == "result":
+            print(f"[{'ok' if fields['success'] else 'failed'}] {fields['emed_no']}", flush=True)
+        elif event == "summary":
+            print(f"Succeeded: {fields['succeeded']} ({fields['first_pass_succeeded']} on the first pass), "
+                  f"Failed: {fields['failed']}", flush=True)
+
+    def update_status(self, msg):
+        self._emit("status", message=msg)
+
+    def update_emed_no_listbox(self, emed_no, index=None, highlight=False):
+        pass
+
+    def update_success_listbox(self, emed_no):
+        self.succeeded += 1
+        self._emit("result", emed_no=emed_no, success=True)
+
+    def update_failure_listbox(self, emed_no):
+        self.failed += 1
+        self._emit("result", emed_no=emed_no, success=False)
+
+    def update_counts(self):
+        pass
+
+    def clear_listboxes(self):
+        pass
+
+    def summary(self, stats):
+        self._emit("summary", succeeded=self.succeeded, failed=self.failed,
+                   first_pass_succeeded=stats.get("first_pass_succeeded", 0), retries=stats.get("retries", 0))
+
+
+def load_credentials(args):
+    """Return (user_id, password) from the credentials file or EMEDICAL_USER / EMEDICAL_PASSWORD."""
+    user_id = args.user or os.environ.get("EMEDICAL_USER", "")
+    password = os.environ.get("EMEDICAL_PASSWORD", "")
+    if args.credentials:
+        with open(args.credentials, encoding='utf-8') as f:
+            credentials = json.load(f)
+        user_id = credentials.get("user_id", user_id)
+        password = credentials.get("password", password)
+    return user_id, password
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the eMedical 502 Chest X-Ray automation without a GUI.")
+    parser.add_argument("excel_paths", nargs="*",
+                        help="Excel file(s) containing the 'eMedical No.' column, or folders of them; "
+                             "several are read in parallel and each eMedical No. is processed once")
+    parser.add_argument("--user", help="eMedical user id (default: $EMEDICAL_USER)")
+    parser.add_argument("--credentials", help='JSON file with {"user_id": ..., "password": ...}')
+    parser.add_argument("--watch", metavar="FOLDER",
+                        help="run as a service: stay logged in and process the new eMedical No. of Excel files "
+                             "landing in FOLDER until stopped (Ctrl-C or SIGTERM)")
+    parser.add_argument("--profiles",
+                        help='JSON list of {"user_id": ..., "password": ..., "name": ...} accounts; the batch is split '
+                             'across them, one process each')
+    parser.add_argument("--url", default=EMEDICAL_URL, help="eMedical URL (default: $EMEDICAL_URL or the live site)")
+    parser.add_argument("--plans", help="JSON file with the per-country form plans (default: plans.json)")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"number of browser sessions (1-{MAX_WORKERS})")
+    parser.add_argument("--tabs", type=int, default=1,
+                        help=f"cases in flight per browser, each in its own tab of the same login (1-{MAX_PIPELINE_DEPTH})")
+    parser.add_argument("--order", choices=SCHEDULING_POLICIES, default=DEFAULT_SCHEDULING_POLICY,
+                        help="case order: grouped keeps each browser on one country's form flow, fifo follows the "
+                             f"spreadsheet, shortest takes the quickest country first (default: {DEFAULT_SCHEDULING_POLICY})")
+    parser.add_argument("--timeout", type=float, help="timeout in seconds for every page wait")
+    parser.add_argument("--lean", action="store_true", help="block images, fonts, media and analytics")
+    parser.add_argument("--no-fast-fill", action="store_true",
+                        help="click the findings radio buttons one by one instead of setting them in one script")
+    parser.add_argument("--page-load-strategy", choices=PAGE_LOAD_STRATEGIES, default=DEFAULT_PAGE_LOAD_STRATEGY)
+    parser.add_argument("--retries", type=int, default=MAX_RETRIES,
+                        help=f"retries per eMedical No. after a transient failure (default: {MAX_RETRIES})")
+    parser.add_argument("--recycle-after", type=int, default=RECYCLE_AFTER_CASES,
+                        help=f"relaunch each browser after this many cases, 0 to disable (default: {RECYCLE_AFTER_CASES})")
+    parser.add_argument("--resume", action="store_true", help="skip eMedical No. completed in a previous run")
+    parser.add_argument("--status-ttl", type=float, default=CASE_STATUS_TTL / 3600,
+                        help="hours to trust a case seen as completed before opening it again, 0 to always open "
+                             f"(default: {CASE_STATUS_TTL / 3600:g})")
+    parser.add_argument("--write-back", action="store_true",
+                        help=f"when the run ends (and every {WATCH_WRITE_BACK_INTERVAL:g} s with --watch), mark "
+                             "each row in its source workbook: fill succeeded eMedical No. (so the next run skips "
+                             "them) and add status and time columns; openpyxl rewrites the workbook, losing cached "
+                             "formula results, images and charts")
+    parser.add_argument("--show-browser", action="store_true", help="run Chrome with a visible window")
+    parser.add_argument("--json", action="store_true", help="stream progress as JSON lines")
+    parser.add_argument("--trace", help="export per-step timings to FILE (.jsonl, .csv, or Chrome trace .json)")
+    args = parser.parse_args(argv)
+    if bool(args.excel_paths) == bool(args.watch):
+        parser.error("give either Excel files or --watch FOLDER")
+    if args.watch and args.profiles:
+        parser.error("--watch runs under one account and cannot be combined with --profiles")
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    profiles = None
+    try:
+        if args.profiles:
+            profiles = load_profiles(args.profiles)
+        user_id, password = load_credentials(args)
+    except (OSError, ValueError) as e:
+        print(f"Cannot read credentials: {e}", file=sys.stderr)
+        return EXIT_USAGE
+    if not profiles and (not user_id or not password):
+        print("Missing credentials: use --credentials or set EMEDICAL_USER and EMEDICAL_PASSWORD", file=sys.stderr)
+        return EXIT_USAGE
+
+    try:
+        plans = FormPlans(args.plans) if args.plans else FormPlans.default()
+    except (OSError, ValueError) as e:
+        print(f"Cannot load form plans: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+    wait_settings = None
+    if args.timeout:
+        wait_settings = {name: (args.timeout, poll) for name, (_, poll) in WAIT_SETTINGS.items()}
+
+    journal = CheckpointJournal()
+    web_automator = EmedicalWebAutomator(args.url, wait_settings, plans=plans)
+    web_automator.configure_browser(args.lean, args.page_load_strategy, args.tabs)
+    web_automator.monitor.recycle_after = args.recycle_after
+    web_automator.fast_fill = not args.no_fast_fill
+    case_index = CaseStatusIndex(ttl=args.status_ttl * 3600) if args.status_ttl > 0 else None
+    workflow_manager = EmedicalWorkflowManager(ExcelProcessor(), web_automator, journal, case_index)
+    workflow_manager.trace_path = args.trace
+    workflow_manager.scheduling_policy = args.order
+    if args.write_back:
+        workflow_manager.result_writer = ResultWriter()
+    reporter = ConsoleReporter(as_json=args.json)
+    workflow_manager.set_gui_callbacks(
+        update_status=reporter.update_status,
+        update_emed_no_listbox=reporter.update_emed_no_listbox,
+        update_success_listbox=reporter.update_success_listbox,
+        update_failure_listbox=reporter.update_failure_listbox,
+        update_counts=reporter.update_counts,
+        clear_listboxes=reporter.clear_listboxes
+    )
+    # Finish the case in progress on Ctrl-C instead of abandoning it half-submitted
+    signal.signal(signal.SIGINT, lambda signum, frame: workflow_manager.stop_workflow())
+    if args.watch:
+        # The usual way a service manager stops the watcher
+        signal.signal(signal.SIGTERM, lambda signum, frame: workflow_manager.stop_workflow())
+
+    try:
+        if args.watch:
+            processed = workflow_manager.watch_folder(
+                user_id, password, args.watch, headless=not args.show_browser, workers=args.workers
+            )
+        elif profiles:
+            processed = workflow_manager.start_sharded(
+                profiles, args.excel_paths, headless=not args.show_browser, close_browser=True,
+                workers=args.workers, resume=args.resume, retries=args.retries
+            )
+        else:
+            processed = workflow_manager.start_workflow(
+                user_id, password, args.excel_paths, headless=not args.show_browser, close_browser=True,
+                workers=args.workers, resume=args.resume, retries=args.retries
+            )
+    finally:
+        journal.close()
+
+    reporter.summary(workflow_manager.stats)
+    # A service only ends when stopped, so stopping is not an interruption
+    if stop_event.is_set() and not args.watch:
+        return EXIT_INTERRUPTED
+    if not processed:
+        return EXIT_NOT_PROCESSED
+    return EXIT_FAILURES if reporter.failed else EXIT_OK
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2833 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@author: Hsin-ming Chen
+@license: MIT
+@file: emedical.py
+@time: 2025/08/16
+@contact: hsinming.chen@gmail.com
+@software: PyCharm
+"""
+import csv
+import heapq
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+from array import array
+from math import ceil
+from contextlib import contextmanager
+from pathlib import Path
+from datetime import datetime
+from time import perf_counter, sleep, time
+import threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from openpyxl import load_workbook
+from openpyxl.styles import PatternFill
+import helium
+from helium import write, click, find_all, Text, TextField, Button, RadioButton, CheckBox, Alert
+from helium._impl import APIImpl
+from selenium.webdriver import ChromeOptions
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.common.exceptions import (
+    ElementClickInterceptedException, ElementNotInteractableException, NoSuchElementException,
+    StaleElementReferenceException, TimeoutException, WebDriverException
+)
+
+from log_setup import configure_logging, log_context, forward_logging, child_logging
+
+try:
+    import psutil
+except ImportError:  # optional; without it browser memory falls back to the page's JS heap
+    psutil = None
+
+# --- Global Constants ---
+VERSION = "1.6"
+# Override with the EMEDICAL_URL environment variable, e.g. to run against benchmarks/mock_server.py
+EMEDICAL_URL = os.environ.get('EMEDICAL_URL', 'https://www.emedical.immi.gov.au/eMedUI/eMedical')
+MAX_LOGIN_ATTEMPTS = 1
+DEFAULT_WORKERS = 1
+MAX_WORKERS = os.cpu_count() or 1
+# Workbooks parsed at the same time when several files or a folder are given
+MAX_INGEST_PROCESSES = min(4, os.cpu_count() or 1)
+# Tabs (cases in flight) per logged-in browser in pipelined mode
+MAX_PIPELINE_DEPTH = 4
+
+# --- Scheduling ---
+# Order in which queued eMedical No. are handed to browsers: "grouped" keeps each browser on one
+# country's form flow as long as that country has work, "fifo" follows the spreadsheet, and
+# "shortest" takes the country with the lowest mean case time measured so far first
+SCHEDULING_POLICIES = ("grouped", "fifo", "shortest")
+DEFAULT_SCHEDULING_POLICY = "grouped"
+
+# --- Retry Settings ---
+# Transient failures are re-queued at the end of the batch, up to MAX_RETRIES times per eMedical No.,
+# waiting RETRY_BASE_DELAY * 2 ** (attempt - 1) seconds (capped at RETRY_MAX_DELAY) before each retry
+MAX_RETRIES = 2
+RETRY_BASE_DELAY = 5
+RETRY_MAX_DELAY = 60
+
+# --- Watchdog Settings ---
+# Restart the browser and log in again after this many consecutive failed cases
+MAX_CONSECUTIVE_FAILURES = 3
+# Seconds a healthy browser gets to answer a probe or to quit before its driver is killed
+WATCHDOG_PROBE_TIMEOUT = 5
+# True while eMedical shows its logon form, i.e. the session has expired
+LOGGED_OUT_SCRIPT = """
+return Array.prototype.some.call(
+    document.querySelectorAll("button, input[type=submit], input[type=button]"),
+    function (el) { return [el.value, el.textContent].some(function (t) { return (t || "").trim().toLowerCase() === "logon"; }); }
+);
+"""
+
+# --- Browser Recycling ---
+# Relaunch the browser and log in again after this many cases (0 disables)...
+RECYCLE_AFTER_CASES = 300
+# ...when the browser's processes use more memory than this (JS heap limit applies without psutil)...
+RECYCLE_RSS_MB = 1500
+RECYCLE_JS_HEAP_MB = 400
+# ...or when the last LATENCY_WINDOW cases take RECYCLE_LATENCY_FACTOR times as long as the first ones
+RECYCLE_LATENCY_FACTOR = 2.0
+LATENCY_WINDOW = 10
+
+# --- Case Status ---
+# How long a known case status is trusted before the case is looked at again
+CASE_STATUS_TTL = 24 * 60 * 60
+# Headers of the status column of the case search results, and the whole status values meaning the
+# exam needs no more work (lower case, whitespace collapsed). Any other value, or a results table
+# without such a column, counts as outstanding: a false skip would leave an exam silently undone
+CASE_STATUS_HEADERS = ("status", "case status", "health case status", "exam status")
+COMPLETED_CASE_STATUSES = frozenset({"submitted", "finalised", "finalized", "completed"})
+
+# --- Result Write-back ---
+# Fill of submitted rows (Excel's light green "Good"); any fill makes extraction skip the row next time
+WRITE_BACK_FILL = "FFC6EFCE"
+WRITE_BACK_STATUS_HEADER = "Automation Status"
+WRITE_BACK_TIME_HEADER = "Automation Time"
+
+# --- Hot Folder ---
+# Seconds between polls of a watched folder, how long a file must stay unchanged before it is
+# read (so a half-copied export is not), and how often every file is stat'ed even if the
+# folder's own modification time says nothing was added, removed or renamed
+WATCH_INTERVAL = 1.0
+WATCH_DEBOUNCE = 2.0
+WATCH_FULL_SCAN = 60.0
+# Seconds between write-backs while watching, as the service may run for days before it stops
+WATCH_WRITE_BACK_INTERVAL = 30.0
+
+# --- Wait Settings ---
+# (timeout, poll interval) in seconds for each DOM condition WaitEngine can wait on
+WAIT_SETTINGS = {
+    "text": (10, 0.1),
+    "clickable": (10, 0.1),
+    "alert": (10, 0.1),
+    "ready_state": (10, 0.05),
+    "overlay_gone": (10, 0.1),
+    "network_idle": (3, 0.05),
+}
+# How long the page must go without network activity to count as idle; network idle is best
+# effort (a settle step goes on after its timeout) and requests open longer than
+# NETWORK_LONG_REQUEST_SECS are taken for ZK server push or keep-alive polls and not waited on
+NETWORK_IDLE_SECS = 0.25
+NETWORK_LONG_REQUEST_SECS = 2.0
+# Busy indicators (eMedical is a ZK application) that block interaction while visible
+OVERLAY_SELECTORS = [
+    ".z-loading", ".z-apply-loading", ".z-apply-mask", ".z-modal-mask",
+    ".blockUI", ".ui-widget-overlay", "[aria-busy='true']",
+]
+
+# --- Lean Browsing ---
+PAGE_LOAD_STRATEGIES = ("normal", "eager", "none")
+DEFAULT_PAGE_LOAD_STRATEGY = "normal"
+# URL patterns blocked in lean browsing mode; stylesheets and scripts stay enabled so the ZK forms still work
+LEAN_BLOCKED_URL_PATTERNS = [
+    "*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp3", "*.mp4", "*.webm",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*hotjar.com*",
+]
+
+# --- Logging Setup ---
+journal_file = Path("journal.jsonl")
+case_status_file = Path("case_status.json")
+# Per-country form plans, see FormPlans
+plans_file = Path(__file__).with_name("plans.json")
+UNKNOWN_COUNTRY = "未知國家"
+# Console and the rotating JSON log, see log_setup.py
+configure_logging()
+
+# --- Global Event ---
+stop_event = threading.Event()
+
+# --- Per-thread Helium Driver ---
+# Helium keeps a single process-wide driver. Route its API through a
+# thread-local so each EmedicalWebAutomator can drive its own browser.
+_thread_local = threading.local()
+_default_get_api_impl = helium._get_api_impl
+
+def _get_thread_api_impl():
+    api_impl = getattr(_thread_local, 'api_impl', None)
+    return api_impl if api_impl is not None else _default_get_api_impl()
+
+helium._get_api_impl = _get_thread_api_impl
+
+# --- Class Definitions ---
+
+class ExcelProcessor:
+    def __init__(self):
+        # Decide font/fill eligibility once per cell style instead of once per cell
+        self.cache_styles = True
+
+    def extract_emedical_no(self, file_path):
+        """Read every eMedical No. in the workbook into a list."""
+        return list(self.iter_emedical_no(file_path))
+
+    def iter_emedical_no(self, file_path):
+        """Lazily yield eMedical No. while streaming the workbook row by row."""
+        for emed_no, _, _ in self.iter_entries(file_path):
+            yield emed_no
+
+    def iter_entries(self, file_path):
+        """Lazily yield (eMedical No., sheet title, row number) while streaming the workbook row by row."""
+        is_eligible = self.eligibility_filter()
+
+        if not Path(file_path).exists():
+            logging.error(f"Excel file not found: {file_path}")
+            return
+
+        try:
+            wb = load_workbook(file_path, read_only=True, data_only=True)
+        except Exception as e:
+            logging.error(f"Error reading Excel: {e}")
+            return
+
+        count = 0
+        try:
+            for ws in wb.worksheets:
+                # 0-based columns of every 'eMedical No.' header seen so far; numbers are read below each
+                columns = []
+                # The scan ends at the sheet's recorded dimension. openpyxl would stop there without a word,
+                # so the dimension is dropped and numbers in rows past it are only counted, to warn about them
+                last_row = ws.max_row
+                ws.reset_dimensions()
+                skipped = 0
+                for row_number, row in enumerate(ws.iter_rows(), start=1):
+                    cells = [row[idx] for idx in columns if idx < len(row)]
+                    if last_row is not None and row_number > last_row:
+                        skipped += sum(1 for cell in cells if cell.value)
+                        continue
+                    for cell in cells:
+                        if cell.value and not self._is_header(cell) and is_eligible(cell):
+                            count += 1
+                            yield str(cell.value), ws.title, row_number
+                    columns.extend(idx for idx in self._find_header_columns(row) if idx not in columns)
+
+                if not columns:
+                    logging.warning(f"'eMedical No.' field not found in sheet {ws.title}")
+                if skipped:
+                    logging.warning(f"Skipped {skipped} eMedical No. in sheet {ws.title} below row {last_row}, "
+                                    "the end of the sheet as recorded in the file; re-save it in Excel to read them")
+        finally:
+            wb.close()
+
+        if count == 0:
+            logging.warning("No valid eMedical No. read.")
+
+    def iter_sources(self, paths):
+        """
+        Yield (eMedical No., (file, sheet, row)) from workbooks and folders of workbooks, each number once.
+
+        A single workbook is streamed row by row. Several are parsed in parallel
+        processes and each one's numbers are yielded as soon as it has been read,
+        so processing can start before the slowest workbook is done.
+        """
+        files = expand_workbooks(paths)
+        if len(files) > 1:
+            logging.info(f"Reading {len(files)} workbooks in parallel")
+        # eMedical No. -> where it was first seen
+        seen = {}
+        duplicates = 0
+        for path, (emed_no, sheet, row) in self._iter_workbook_entries(files):
+            source = (str(path), sheet, row)
+            first = seen.get(emed_no)
+            if first is not None:
+                duplicates += 1
+                logging.info(f"Duplicate eMedical No. {emed_no} in {path} ({sheet} row {row}), "
+                             f"first seen in {first[0]} ({first[1]} row {first[2]})")
+                continue
+            seen[emed_no] = source
+            yield emed_no, source
+        if duplicates:
+            logging.warning(f"Skipped {duplicates} duplicate eMedical No.")
+
+    def _iter_workbook_entries(self, files):
+        """Yield (file, entry) of every workbook, reading several at once in a process pool."""
+        if len(files) <= 1:
+            for path in files:
+                for entry in self.iter_entries(path):
+                    yield path, entry
+            return
+
+        # Spawn rather than fork, as start_sharded does: the caller may be running browser threads
+        context = multiprocessing.get_context("spawn")
+        with child_logging(context) as log_queue, \
+                ProcessPoolExecutor(max_workers=min(len(files), MAX_INGEST_PROCESSES), mp_context=context,
+                                    initializer=forward_logging, initargs=(log_queue,)) as executor:
+            futures = {executor.submit(_read_workbook_entries, path, self.cache_styles): path for path in files}
+            try:
+                for future in as_completed(futures):
+                    path = futures[future]
+                    try:
+                        entries = future.result()
+                    except Exception as e:
+                        logging.error(f"Error reading Excel {path}: {e}")
+                        continue
+                    for entry in entries:
+                        yield path, entry
+            finally:
+                # Stopped early: do not start the workbooks still waiting
+                for future in futures:
+                    future.cancel()
+
+    def eligibility_filter(self):
+        """
+        Return a function telling whether a cell is in black font without fill, the
+        marking of numbers still to be processed. Use a new one per workbook: with
+        cache_styles it remembers the answer per style id, which is workbook-specific.
+        """
+        if not self.cache_styles:
+            return lambda cell: self._is_black_font(cell) and self._is_no_fill(cell)
+
+        # Style id -> eligibility, so the font and fill proxies are only read once per distinct style
+        eligible_styles = {}
+
+        def is_eligible(cell):
+            style_id = getattr(cell, "_style_id", None)
+            if style_id is None:
+                return self._is_black_font(cell) and self._is_no_fill(cell)
+            eligible = eligible_styles.get(style_id)
+            if eligible is None:
+                eligible = eligible_styles[style_id] = self._is_black_font(cell) and self._is_no_fill(cell)
+            return eligible
+        return is_eligible
+
+    @staticmethod
+    def _is_black_font(cell):
+        return (
+            cell.font is None or
+            cell.font.color is None or
+            cell.font.color.rgb in ["FF000000", None]
+        )
+
+    @staticmethod
+    def _is_no_fill(cell):
+        return (
+            cell.fill is None or
+            cell.fill.fgColor is None or
+            cell.fill.fgColor.rgb in ["00000000", "FFFFFFFF", None]
+        )
+
+    @staticmethod
+    def _is_header(cell):
+        return isinstance(cell.value, str) and cell.value.strip() == "eMedical No."
+
+    @staticmethod
+    def _find_header_columns(row):
+        """Return the 0-based columns of the 'eMedical No.' headers in the row."""
+        return [idx for idx, cell in enumerate(row) if ExcelProcessor._is_header(cell)]
+
+def expand_workbooks(paths):
+    """Return the .xlsx files among paths, with folders replaced by the workbooks in them (Excel lock files skipped)."""
+    files = []
+    for path in map(Path, paths):
+        if path.is_dir():
+            files.extend(sorted(p for p in path.glob("*.xlsx") if not p.name.startswith("~$")))
+        else:
+            files.append(path)
+    return files
+
+
+def _read_workbook_entries(path, cache_styles=True):
+    """Process pool entry point: return every entry of one workbook."""
+    excel_processor = ExcelProcessor()
+    excel_processor.cache_styles = cache_styles
+    return list(excel_processor.iter_entries(path))
+
+class FolderWatcher:
+    """
+    Polls a folder for new or changed Excel files and yields the eMedical No. in them not seen before.
+
+    Between full scans only the folder's modification time is checked, and only
+    files whose size or modification time changed are read, so a large folder is
+    not re-read. A file is read once it has stayed unchanged for `debounce` seconds.
+    """
+    def __init__(self, folder, excel_processor, interval=WATCH_INTERVAL, debounce=WATCH_DEBOUNCE,
+                 full_scan=WATCH_FULL_SCAN, on_file=None, stop=None):
+        self.folder = Path(folder)
+        self.excel_processor = excel_processor
+        self.interval = interval
+        self.debounce = debounce
+        self.full_scan = full_scan
+        # Called with (path, new eMedical No. count) after each file is read
+        self.on_file = on_file
+        # Ends the watch like stop_event, e.g. once no browser is left to process what is read
+        self.stop = stop or threading.Event()
+        # File name -> (size, mtime) when it was last read
+        self._read = {}
+        # File name -> ((size, mtime), when it was first seen like that), for files waiting to settle
+        self._settling = {}
+        self._folder_mtime = None
+        self._last_full_scan = 0.0
+        # eMedical No. already yielded -> (file, sheet, row) it was first read from
+        self.sources = {}
+
+    def poll(self):
+        """Return the workbooks that are new or changed and have settled since they were first noticed."""
+        now = time()
+        folder_mtime = self.folder.stat().st_mtime_ns
+        if folder_mtime == self._folder_mtime and not self._settling and now - self._last_full_scan < self.full_scan:
+            return []
+        self._folder_mtime = folder_mtime
+        self._last_full_scan = now
+
+        ready = []
+        present = set()
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if not entry.name.lower().endswith(".xlsx") or entry.name.startswith("~$") or not entry.is_file():
+                    continue
+                present.add(entry.name)
+                stat = entry.stat()
+                signature = (stat.st_size, stat.st_mtime_ns)
+                if self._read.get(entry.name) == signature:
+                    continue
+                settling = self._settling.get(entry.name)
+                if settling is None or settling[0] != signature:
+                    self._settling[entry.name] = (signature, now)
+                elif now - settling[1] >= self.debounce:
+                    del self._settling[entry.name]
+                    self._read[entry.name] = signature
+                    ready.append(Path(entry.path))
+        for name in list(self._settling):
+            if name not in present:
+                del self._settling[name]
+        return sorted(ready)
+
+    def __iter__(self):
+        """Yield new eMedical No. as workbooks land, until the workflow or the watch is stopped."""
+        logging.info(f"Watching {self.folder} for Excel files")
+        while not stop_event.is_set() and not self.stop.is_set():
+            for path in self.poll():
+                new = 0
+                for emed_no, sheet, row in self.excel_processor.iter_entries(path):
+                    if emed_no not in self.sources:
+                        self.sources[emed_no] = (str(path), sheet, row)
+                        new += 1
+                        yield emed_no
+                logging.info(f"{path.name}: {new} new eMedical No.")
+                if self.on_file:
+                    self.on_file(path, new)
+            stop_event.wait(self.interval)
+
+# --- Locators ---
+TB_QUESTION = '7. Are there strong suspicions of active Tuberculosis (TB)?'
+DECLARATION = 'I declare that the chest X-ray examination report is a true and correct record of my findings.'
+GRADE_A = 'A - No evidence of active TB, or changes consistent with old or inactive TB, or changes suggestive of other significant diseases identified.'
+
+# Logical fields of the case search and 502 forms, as the Helium lookups that first find them
+LOCATORS = {
+    "search_by_hcid": lambda: RadioButton('Using Health Case Identifier'),
+    "case_id": lambda: TextField('ID'),
+    "search": lambda: Button('Search', to_right_of=Button('Reset')),
+    "select_all": lambda: Button('All'),
+    "manage_case": lambda: Button('Manage Case'),
+    "cxr_exam": lambda: Text('502 Chest X-Ray Examination'),
+    "findings": lambda: Text('Findings'),
+    "findings_normal": lambda: RadioButton('Normal', to_right_of=Text('Findings')),
+    "detailed_findings": lambda: Text('Detailed radiology findings'),
+    "normal": lambda: RadioButton('Normal'),
+    "absent": lambda: RadioButton('Absent'),
+    "tb_no": lambda: RadioButton('No', to_right_of=RadioButton('Not selected', to_right_of=Text(TB_QUESTION))),
+    "none_present": lambda: RadioButton('None of the following are present'),
+    "next": lambda: Button('Next'),
+    "prepare_declaration": lambda: Button('Prepare for declaration'),
+    "prepare_grading": lambda: Button('Prepare for grading'),
+    "declaration": lambda: CheckBox(DECLARATION),
+    "grade_a": lambda: RadioButton(GRADE_A),
+    "submit": lambda: Button('Submit Exam'),
+    "close": lambda: Button('Close'),
+}
+
+# Radio buttons and checkboxes that fast fill sets in one script call, as
+# (label, text their row must contain or None, whether every match is set rather than the first)
+CHOICE_FIELDS = {
+    "normal": ("Normal", None, True),
+    "absent": ("Absent", None, False),
+    "tb_no": ("No", TB_QUESTION, False),
+    "none_present": ("None of the following are present", None, False),
+}
+
+class WaitEngine:
+    """
+    Waits on concrete DOM conditions of one browser session instead of fixed sleeps.
+    """
+    # Counts in-flight XHR/fetch requests younger than arguments[0] seconds and reports how long
+    # the page has been quiet
+    _NETWORK_PROBE_JS = """
+        var w = window;
+        if (w.__emedNet === undefined) {
+            var net = w.__emedNet = {open: {}, next: 0, last: Date.now()};
+            var start = function() {
+                var id = net.next++;
+                net.open[id] = net.last = Date.now();
+                return function() { delete net.open[id]; net.last = Date.now(); };
+            };
+            var send = XMLHttpRequest.prototype.send;
+            XMLHttpRequest.prototype.send = function() {
+                this.addEventListener('loadend', start());
+                return send.apply(this, arguments);
+            };
+            if (w.fetch) {
+                var fetch = w.fetch;
+                w.fetch = function() {
+                    return fetch.apply(this, arguments).finally(start());
+                };
+            }
+        }
+        var now = Date.now(), pending = 0, lastEnd = 0;
+        for (var id in w.__emedNet.open) {
+            if (now - w.__emedNet.open[id] < arguments[0] * 1000) pending++;
+        }
+        performance.getEntriesByType('resource').forEach(function(e) { lastEnd = Math.max(lastEnd, e.responseEnd); });
+        return [pending, Math.min(now - w.__emedNet.last, performance.now() - lastEnd) / 1000];
+    """
+
+    _OVERLAY_PROBE_JS = """
+        return arguments[0].some(function(selector) {
+            return Array.prototype.some.call(document.querySelectorAll(selector), function(e) {
+                return e.offsetWidth > 0 || e.offsetHeight > 0;
+            });
+        });
+    """
+
+    def __init__(self, api_impl, settings=None):
+        self.api_impl = api_impl
+        self.settings = dict(WAIT_SETTINGS)
+        if settings:
+            self.settings.update(settings)
+
+    def until(self, condition, name, timeout=None, poll=None):
+        """Poll condition(driver) until it returns a truthy value, raising TimeoutException after the timeout."""
+        default_timeout, default_poll = self.settings[name]
+        driver = self.api_impl.require_driver().unwrap()
+        wait = WebDriverWait(
+            driver,
+            default_timeout if timeout is None else timeout,
+            poll_frequency=default_poll if poll is None else poll,
+            ignored_exceptions=(StaleElementReferenceException, LookupError)
+        )
+        return wait.until(condition, message=f"Timed out waiting for {name}")
+
+    def text(self, text, timeout=None, poll=None):
+        """Wait until the given text is present on the page."""
+        return self.until(lambda driver: Text(text).exists(), "text", timeout, poll)
+
+    def clickable(self, element, timeout=None, poll=None):
+        """Wait until a visible, enabled match of the Helium element exists and return it."""
+        def find_clickable(driver):
+            for match in find_all(element):
+                web_element = match.web_element
+                if web_element.is_displayed() and web_element.is_enabled():
+                    return match
+            return None
+        return self.until(find_clickable, "clickable", timeout, poll)
+
+    def alert(self, timeout=None, poll=None):
+        """Wait until a JavaScript alert is open."""
+        return self.until(lambda driver: Alert().exists(), "alert", timeout, poll)
+
+    def ready_state(self, timeout=None, poll=None):
+        """Wait until document.readyState is 'complete'."""
+        return self.until(
+            lambda driver: driver.execute_script("return document.readyState") == "complete",
+            "ready_state", timeout, poll
+        )
+
+    def overlay_gone(self, timeout=None, poll=None):
+        """Wait until no loading spinner or modal overlay is visible."""
+        return self.until(
+            lambda driver: not driver.execute_script(self._OVERLAY_PROBE_JS, OVERLAY_SELECTORS),
+            "overlay_gone", timeout, poll
+        )
+
+    def network_idle(self, idle_secs=NETWORK_IDLE_SECS, timeout=None, poll=None):
+        """
+        Wait until no short-lived request is in flight and none has finished for idle_secs.
+
+        Returns False instead of raising when the network does not go idle in time.
+        """
+        def is_idle(driver):
+            pending, quiet_secs = driver.execute_script(self._NETWORK_PROBE_JS, NETWORK_LONG_REQUEST_SECS)
+            return pending == 0 and quiet_secs >= idle_secs
+        try:
+            return self.until(is_idle, "network_idle", timeout, poll)
+        except TimeoutException:
+            logging.debug("Network still busy, continuing")
+            return False
+
+    def page_settled(self):
+        """Wait until the page has loaded and its busy overlays are gone, then briefly for network idle."""
+        self.ready_state()
+        self.overlay_gone()
+        self.network_idle()
+
+class LocatorRegistry:
+    """
+    Resolves the logical LOCATORS fields of one browser session.
+
+    The first Helium match of a field is compiled into a CSS selector plus the
+    element's label (and, for single fields, the text of its row), so later
+    lookups are a single script call. Resolved elements are cached until
+    new_page() is called; a compiled selector that misses falls back to Helium.
+    """
+    _FINGERPRINT_JS = """
+        function clean(t) { return (t || '').replace(/\\s+/g, ' ').trim(); }
+        window.__emedLabel = function(e) {
+            if (e.labels && e.labels.length) return clean(e.labels[0].textContent);
+            if (e.tagName === 'INPUT') return clean(/^(button|submit|reset)$/i.test(e.type) ? e.value : e.placeholder || e.name);
+            return clean(e.textContent);
+        };
+        window.__emedContext = function(e) {
+            var row = e.closest('tr') || (e.parentElement && e.parentElement.parentElement) || e;
+            return clean(row.textContent).slice(0, 200);
+        };
+    """
+
+    _COMPILE_JS = _FINGERPRINT_JS + """
+        var e = arguments[0];
+        var css = e.tagName.toLowerCase() + (e.getAttribute('type') ? "[type='" + e.getAttribute('type') + "']" : '');
+        return [css, window.__emedLabel(e), window.__emedContext(e)];
+    """
+
+    _RESOLVE_JS = """
+        if (window.__emedLabel === undefined) {""" + _FINGERPRINT_JS + """}
+        var label = arguments[1], context = arguments[2];
+        return Array.prototype.filter.call(document.querySelectorAll(arguments[0]), function(e) {
+            return window.__emedLabel(e) === label && (context === null || window.__emedContext(e) === context);
+        });
+    """
+
+    # Clicks every unchecked CHOICE_FIELDS match (arguments[1] true) or only reads them back, and
+    # returns the labels that were not found or are still unchecked
+    _FILL_JS = _FINGERPRINT_JS + """
+        var fields = arguments[0], apply = arguments[1], problems = [];
+        var inputs = document.querySelectorAll("input[type='radio'], input[type='checkbox']");
+        fields.forEach(function(field) {
+            var matches = Array.prototype.filter.call(inputs, function(e) {
+                if (window.__emedLabel(e) !== field[0]) return false;
+                if (field[1] === null) return true;
+                var row = e.closest('tr') || (e.parentElement && e.parentElement.parentElement) || e;
+                return clean(row.textContent).indexOf(field[1]) >= 0;
+            });
+            if (!field[2]) matches = matches.slice(0, 1);
+            if (!matches.length) problems.push(field[0]);
+            matches.forEach(function(e) {
+                if (!e.checked && apply) e.click();
+                if (!e.checked && problems.indexOf(field[0]) < 0) problems.push(field[0]);
+            });
+        });
+        return problems;
+    """
+
+    def __init__(self, api_impl, waits, compiled=True, selectors=None):
+        self.api_impl = api_impl
+        self.waits = waits
+        self.compiled = compiled
+        # Compiled selectors may be shared by the registries of several tabs
+        self._selectors = {} if selectors is None else selectors
+        self._elements = {}
+        self.stats = {"cache_hits": 0, "selector_lookups": 0, "helium_lookups": 0, "fill_scripts": 0,
+                      "fill_fallbacks": 0}
+
+    @property
+    def lookups(self):
+        """Number of DOM searches performed so far."""
+        return self.stats["selector_lookups"] + self.stats["helium_lookups"] + self.stats["fill_scripts"]
+
+    def new_page(self):
+        """Forget the elements resolved on the previous page."""
+        self._elements.clear()
+
+    def find_all(self, name):
+        """Return every element matching the field on the current page."""
+        return self._resolve(name, many=True)
+
+    def find(self, name):
+        """Return the field's element on the current page, or None."""
+        elements = self._resolve(name, many=False)
+        return elements[0] if elements else None
+
+    def exists(self, name):
+        return self.find(name) is not None
+
+    def is_selected(self, name):
+        return self._with_element(name, lambda element: element.is_selected())
+
+    def is_enabled(self, name):
+        return self._with_element(
+            name, lambda element: element.is_enabled() and element.get_attribute('aria-disabled') != 'true'
+        )
+
+    def click(self, name):
+        """
+        Wait until the field can be clicked, then click it. Raises NoSuchElementException if
+        the field never appears, TimeoutException if it stays covered or disabled.
+        """
+        seen = False
+
+        def try_click(driver):
+            nonlocal seen
+            try:
+                self._with_element(name, lambda element: element.click())
+            except NoSuchElementException:
+                return False
+            except (ElementClickInterceptedException, ElementNotInteractableException):
+                seen = True
+                return False
+            return True
+        try:
+            self.waits.until(try_click, "clickable")
+        except TimeoutException:
+            if not seen:
+                raise NoSuchElementException(f"Field not found: {name}") from None
+            raise
+
+    def select(self, name):
+        """Click a radio button or checkbox unless it is already selected."""
+        if not self.wait_for(name).is_selected():
+            self.click(name)
+
+    def fill(self, names):
+        """
+        Set the CHOICE_FIELDS in one script call, then verify them with one read-back
+        once the page has settled. Returns False if any field could not be set.
+        """
+        driver = self.api_impl.require_driver().unwrap()
+        fields = [CHOICE_FIELDS[name] for name in names]
+        self.stats["fill_scripts"] += 1
+        problems = driver.execute_script(self._FILL_JS, fields, True)
+        if not problems:
+            self.waits.page_settled()
+            self.stats["fill_scripts"] += 1
+            problems = driver.execute_script(self._FILL_JS, fields, False)
+        # The page may have re-rendered the fields
+        self.new_page()
+        if problems:
+            self.stats["fill_fallbacks"] += 1
+            logging.warning(f"Fast fill could not set: {', '.join(problems)}")
+            return False
+        return True
+
+    def write(self, name, text):
+        def write_text(element):
+            element.clear()
+            element.send_keys(text)
+        self._with_element(name, write_text, wait=True)
+
+    def wait_for(self, name):
+        """Wait until the field is present and return its element; NoSuchElementException if it never appears."""
+        try:
+            return self.waits.until(lambda driver: self.find(name), "clickable")
+        except TimeoutException:
+            # The page marker was already seen, so a field still missing means the page is not as expected
+            raise NoSuchElementException(f"Field not found: {name}") from None
+
+    def _with_element(self, name, action, wait=False):
+        """Run action on the field's element, re-resolving it once if it went stale."""
+        for attempt in range(2):
+            element = self.wait_for(name) if wait else self.find(name)
+            if element is None:
+                raise NoSuchElementException(f"Field not found: {name}")
+            try:
+                return action(element)
+            except StaleElementReferenceException:
+                self._elements.pop((name, False), None)
+                if attempt:
+                    raise
+        return None
+
+    def _resolve(self, name, many):
+        key = (name, many)
+        if self.compiled and key in self._elements:
+            self.stats["cache_hits"] += 1
+            return self._elements[key]
+
+        elements = None
+        if self.compiled and key in self._selectors:
+            elements = self._query_selector(*self._selectors[key])
+        if not elements:
+            elements = self._query_helium(name, many)
+            if self.compiled and elements:
+                self._compile(key, elements)
+
+        if self.compiled and elements:
+            self._elements[key] = elements
+        return elements
+
+    def _query_selector(self, css, label, context, ordinal):
+        self.stats["selector_lookups"] += 1
+        driver = self.api_impl.require_driver().unwrap()
+        elements = driver.execute_script(self._RESOLVE_JS, css, label, context)
+        if ordinal is None:
+            return elements
+        return elements[ordinal:ordinal + 1]
+
+    def _query_helium(self, name, many):
+        self.stats["helium_lookups"] += 1
+        matches = find_all(LOCATORS[name]())
+        if not many:
+            matches = matches[:1]
+        return [match.web_element for match in matches]
+
+    def _compile(self, key, elements):
+        name, many = key
+        driver = self.api_impl.require_driver().unwrap()
+        try:
+            css, label, context = driver.execute_script(self._COMPILE_JS, elements[0])
+        except WebDriverException:
+            return
+        if many:
+            self._selectors[key] = (css, label, None, None)
+            return
+        # A single field is the n-th element with this label and row text
+        candidates = driver.execute_script(self._RESOLVE_JS, css, label, context)
+        if elements[0] in candidates:
+            self._selectors[key] = (css, label, context, candidates.index(elements[0]))
+
+class Tracer:
+    """
+    Records timed spans (login and each step of the 502 flow) for every eMedical No.
+    """
+    STEPS = ("login", "search", "manage_case", "findings", "review", "declaration", "submit", "close", "case")
+
+    def __init__(self):
+        self.spans = []
+        self._origin = perf_counter()
+        self._origin_wall = time()
+
+    def clear(self):
+        self.spans = []
+
+    @contextmanager
+    def span(self, step, emed_no=None):
+        """
+        Time the enclosed block. The outcome is 'error' if it raises; the block may
+        also set the yielded dict's "outcome" itself.
+        """
+        start = perf_counter()
+        result = {"outcome": "ok"}
+        try:
+            yield result
+        except BaseException:
+            result["outcome"] = "error"
+            raise
+        finally:
+            end = perf_counter()
+            # list.append is atomic, so worker threads can share one tracer
+            self.spans.append((step, emed_no, threading.current_thread().name, start, end, result["outcome"]))
+            logging.debug(f"{step} {result['outcome']} in {end - start:.2f}s",
+                          extra={"emed_no": emed_no, "step": step, "duration": round(end - start, 3)})
+
+    def _records(self):
+        for step, emed_no, worker, start, end, outcome in self.spans:
+            yield {
+                "step": step,
+                "emed_no": emed_no,
+                "worker": worker,
+                "start": datetime.fromtimestamp(self._origin_wall + start - self._origin).isoformat(timespec='milliseconds'),
+                "duration": round(end - start, 4),
+                "outcome": outcome,
+            }
+
+    def export(self, path):
+        """Write the spans as JSONL (.jsonl), CSV (.csv) or Chrome trace-event JSON (anything else)."""
+        path = Path(path)
+        if path.suffix == ".jsonl":
+            with open(path, 'w', encoding='utf-8') as f:
+                for record in self._records():
+                    f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        elif path.suffix == ".csv":
+            with open(path, 'w', encoding='utf-8', newline='') as f:
+                writer = csv.DictWriter(f, fieldnames=["step", "emed_no", "worker", "start", "duration", "outcome"])
+                writer.writeheader()
+                writer.writerows(self._records())
+        else:
+            # Load in chrome://tracing or Perfetto; one row per worker thread
+            events = [
+                {
+                    "name": step, "cat": outcome, "ph": "X", "pid": 1, "tid": worker,
+                    "ts": round((start - self._origin) * 1e6), "dur": round((end - start) * 1e6),
+                    "args": {"emed_no": emed_no},
+                }
+                for step, emed_no, worker, start, end, outcome in self.spans
+            ]
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f, ensure_ascii=False)
+        logging.info(f"Trace written to {path}")
+
+    def summary(self):
+        """Return {step: (count, p50, p95, p99)} of span durations in seconds."""
+        durations = {}
+        for step, _, _, start, end, _ in self.spans:
+            durations.setdefault(step, []).append(end - start)
+
+        def percentile(values, p):
+            # Nearest rank: the smallest value with at least p% of the values at or below it
+            return values[max(0, ceil(p / 100 * len(values)) - 1)]
+
+        result = {}
+        for step in sorted(durations, key=lambda s: self.STEPS.index(s) if s in self.STEPS else len(self.STEPS)):
+            values = sorted(durations[step])
+            result[step] = (len(values), percentile(values, 50), percentile(values, 95), percentile(values, 99))
+        return result
+
+    def log_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        logging.info(f"{'step':<12}{'count':>7}{'p50':>9}{'p95':>9}{'p99':>9}")
+        for step, (count, p50, p95, p99) in summary.items():
+            logging.info(f"{step:<12}{count:>7}{p50:>8.2f}s{p95:>8.2f}s{p99:>8.2f}s")
+
+class NetworkMonitor:
+    """
+    Totals the bytes received and requests blocked per case from Chrome's performance log.
+    """
+    def __init__(self, api_impl):
+        self.api_impl = api_impl
+        self.enabled = False
+        # (bytes received, requests blocked, seconds) of every finished case
+        self.cases = []
+        self._case_start = None
+
+    def _drain(self):
+        """Return (bytes received, requests blocked) logged since the previous call."""
+        received = blocked = 0
+        driver = self.api_impl.require_driver().unwrap()
+        for entry in driver.get_log("performance"):
+            message = json.loads(entry["message"])["message"]
+            if message["method"] == "Network.loadingFinished":
+                received += message["params"].get("encodedDataLength", 0)
+            elif message["method"] == "Network.loadingFailed" and message["params"].get("blockedReason"):
+                blocked += 1
+        return received, blocked
+
+    def start_case(self):
+        if not self.enabled:
+            return
+        try:
+            self._drain()
+            self._case_start = perf_counter()
+        except WebDriverException:
+            self._case_start = None
+
+    def finish_case(self, emed_no):
+        if not self.enabled or self._case_start is None:
+            return
+        try:
+            received, blocked = self._drain()
+        except WebDriverException:
+            return
+        seconds = perf_counter() - self._case_start
+        self.cases.append((received, blocked, seconds))
+        logging.info(f"Network ({emed_no}): {received / 1024:.0f} KB received, {blocked} requests blocked, {seconds:.1f}s")
+
+    def summary(self):
+        """Return the mean (KB received, requests blocked, seconds) per case, or None if nothing was measured."""
+        if not self.cases:
+            return None
+        n = len(self.cases)
+        return (
+            sum(case[0] for case in self.cases) / n / 1024,
+            sum(case[1] for case in self.cases) / n,
+            sum(case[2] for case in self.cases) / n,
+        )
+
+class BrowserMonitor:
+    """
+    Tracks the browser's memory and per-case latency to decide when it should be recycled.
+    """
+    def __init__(self, api_impl, recycle_after=RECYCLE_AFTER_CASES):
+        self.api_impl = api_impl
+        self.recycle_after = recycle_after
+        # Mean seconds per case over the first window of the run, the reference for slowdowns
+        self.baseline = None
+        self.new_browser()
+
+    def new_browser(self):
+        self.cases = 0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+        # Last memory_mb() sample
+        self.memory = (None, None)
+
+    def memory_mb(self):
+        """Return the browser's memory in MB and whether it is process RSS (psutil) or the JS heap, or (None, None)."""
+        driver = self.api_impl.get_driver_impl()
+        if driver is None:
+            return None, None
+        try:
+            if psutil is not None:
+                process = psutil.Process(driver.service.process.pid)
+                rss = sum(p.memory_info().rss for p in [process] + process.children(recursive=True))
+                return rss / 1024 / 1024, True
+            heap = driver.execute_script("return performance.memory ? performance.memory.usedJSHeapSize : null")
+            return (heap / 1024 / 1024, False) if heap else (None, None)
+        except Exception:
+            return None, None
+
+    def finish_case(self, success, seconds):
+        self.cases += 1
+        self.memory = self.memory_mb()
+        # Failed cases mostly measure timeouts, not the browser's speed
+        if success:
+            self.recent.append(seconds)
+            if self.baseline is None and len(self.recent) == LATENCY_WINDOW:
+                self.baseline = sum(self.recent) / LATENCY_WINDOW
+
+    def recycle_reason(self):
+        """Return why the browser should be recycled now, or None."""
+        if self.recycle_after and self.cases >= self.recycle_after:
+            return f"{self.cases} cases since launch"
+        memory, is_rss = self.memory
+        if memory is not None:
+            limit = RECYCLE_RSS_MB if is_rss else RECYCLE_JS_HEAP_MB
+            if memory > limit:
+                return f"{'RSS' if is_rss else 'JS heap'} {memory:.0f} MB over {limit} MB"
+        if self.baseline and len(self.recent) == LATENCY_WINDOW:
+            latency = sum(self.recent) / LATENCY_WINDOW
+            if latency > self.baseline * RECYCLE_LATENCY_FACTOR:
+                return f"{latency:.1f}s per case against {self.baseline:.1f}s at the start"
+        return None
+
+class CaseAlreadyCompleted(Exception):
+    """Raised by a plan when the search results show the case needs no more work."""
+
+class CaseMismatch(Exception):
+    """Raised by a plan when the page shows another case than the one being processed, e.g. switched by another tab."""
+
+class FormPlans:
+    """
+    Per-country 502 form plans, loaded from JSON and validated and compiled once.
+
+    Each country lists its eMedical No. prefixes and the plan it follows. A plan
+    is a list of steps, each an object keyed by its operation: {"click": field},
+    {"select": field}, {"write": field, "text": "{emed_no}"}, {"fill": [fields]},
+    {"click_if_enabled": field}, {"page": marker text}, {"settle": true},
+    {"accept_alert": true}, {"skip_if_completed": true}, {"verify_case": true}, {"include": plan}, and {"span": trace step,
+    "if_exists": field or "if_enabled": field, "steps": [...]}. Fields are
+    LOCATORS names (CHOICE_FIELDS names for "fill").
+    """
+    # Operation -> other keys the step requires
+    OPS = {
+        "click": (), "select": (), "write": ("text",), "fill": (), "click_if_enabled": (), "page": (),
+        "settle": (), "accept_alert": (), "skip_if_completed": (), "verify_case": (), "include": (), "span": ("steps",),
+        "if_exists": ("steps",), "if_enabled": ("steps",),
+    }
+    _default = None
+
+    def __init__(self, path=plans_file):
+        self.path = Path(path)
+        with open(self.path, encoding='utf-8') as f:
+            data = json.load(f)
+        if not isinstance(data, dict) or not isinstance(data.get("plans"), dict) \
+                or not isinstance(data.get("countries"), dict):
+            self._invalid("expected a 'countries' and a 'plans' object")
+        self._raw_plans = data["plans"]
+        self._compiled = {}
+
+        self._country_plans = {}
+        self._prefixes = {}
+        for country, entry in data["countries"].items():
+            plan = entry.get("plan") if isinstance(entry, dict) else None
+            if not self._is_name(plan, self._raw_plans):
+                self._invalid(f"country {country} refers to unknown plan {plan!r}")
+            self._country_plans[country] = self._compile_plan(plan, ())
+            prefixes = entry.get("prefixes", [])
+            if not isinstance(prefixes, list) or not all(isinstance(prefix, str) and prefix for prefix in prefixes):
+                self._invalid(f"country {country}: prefixes must be a list of non-empty strings")
+            for prefix in prefixes:
+                if prefix in self._prefixes:
+                    self._invalid(f"prefix {prefix} is listed for both {self._prefixes[prefix]} and {country}")
+                self._prefixes[prefix] = country
+        # Longest first, so a prefix wins over a shorter one it starts with
+        self._prefix_lengths = sorted({len(prefix) for prefix in self._prefixes}, reverse=True)
+
+    @classmethod
+    def default(cls):
+        """Return the plans of plans_file, loaded on first use."""
+        if cls._default is None:
+            cls._default = cls()
+        return cls._default
+
+    def country_of(self, emed_no):
+        """Determine the country based on the eMedical No. prefix."""
+        for length in self._prefix_lengths:
+            country = self._prefixes.get(emed_no[:length])
+            if country is not None:
+                return country
+        return UNKNOWN_COUNTRY
+
+    def plan_for(self, country):
+        """Return the compiled steps of the country's plan, or None."""
+        return self._country_plans.get(country)
+
+    @staticmethod
+    def run(steps, automator, emed_no):
+        """Run the steps as a generator that pauses before every page wait, letting other tabs work meanwhile."""
+        for step in steps:
+            waiting = step(automator, emed_no)
+            if waiting is not None:
+                yield from waiting
+
+    def _invalid(self, message):
+        raise ValueError(f"{self.path}: {message}")
+
+    @staticmethod
+    def _is_name(value, names):
+        """Whether value is a string among names (a JSON list or object would not even be hashable)."""
+        return isinstance(value, str) and value in names
+
+    def _compile_plan(self, name, including):
+        if name in including:
+            self._invalid(f"plan {name} includes itself")
+        if name not in self._compiled:
+            self._compiled[name] = self._compile_steps(self._raw_plans[name], including + (name,), name)
+        return self._compiled[name]
+
+    def _compile_steps(self, steps, including, where):
+        if not isinstance(steps, list):
+            self._invalid(f"{where}: steps must be a list")
+        compiled = []
+        for i, step in enumerate(steps):
+            compiled.extend(self._compile_step(step, including, f"{where}[{i}]"))
+        return tuple(compiled)
+
+    def _compile_step(self, step, including, where):
+        """Validate one step and return the callables (automator, emed_no) it compiles to."""
+        ops = [key for key in step if key in self.OPS] if isinstance(step, dict) else []
+        if len(ops) != 1:
+            self._invalid(f"{where}: a step needs exactly one of {', '.join(self.OPS)}")
+        op = ops[0]
+        arg = step[op]
+        for key in step:
+            if key != op and key not in self.OPS[op]:
+                self._invalid(f"{where}: unknown key {key!r} in {op} step")
+        for key in self.OPS[op]:
+            if key not in step:
+                self._invalid(f"{where}: {op} step needs {key!r}")
+
+        if op in ("click", "select", "write", "click_if_enabled", "if_exists", "if_enabled") \
+                and not self._is_name(arg, LOCATORS):
+            self._invalid(f"{where}: unknown field {arg!r}")
+        if op == "fill" and (not isinstance(arg, list) or not arg
+                             or not all(self._is_name(name, CHOICE_FIELDS) for name in arg)):
+            self._invalid(f"{where}: fill takes a list of {', '.join(CHOICE_FIELDS)}")
+        if op == "span" and not self._is_name(arg, Tracer.STEPS):
+            self._invalid(f"{where}: unknown trace step {arg!r}")
+        if op == "page" and (not isinstance(arg, str) or not arg.strip()):
+            self._invalid(f"{where}: page takes the marker text of the page")
+        if op == "write" and not isinstance(step["text"], str):
+            self._invalid(f"{where}: text must be a string")
+        if op == "include":
+            if not self._is_name(arg, self._raw_plans):
+                self._invalid(f"{where}: unknown plan {arg!r}")
+            return self._compile_plan(arg, including)
+
+        if op == "click":
+            return (lambda automator, emed_no: automator.locators.click(arg),)
+        if op == "select":
+            return (lambda automator, emed_no: automator.locators.select(arg),)
+        if op == "write":
+            text = step["text"]
+            try:
+                text.format(emed_no="")
+            except (AttributeError, KeyError, IndexError, ValueError):
+                self._invalid(f"{where}: text may only use {{emed_no}}")
+            return (lambda automator, emed_no: automator.locators.write(arg, text.format(emed_no=emed_no)),)
+        if op == "fill":
+            names = list(arg)
+            return (lambda automator, emed_no: automator._fill_choices(names),)
+        if op == "click_if_enabled":
+            def click_if_enabled(automator, emed_no):
+                if automator.locators.exists(arg) and automator.locators.is_enabled(arg):
+                    automator.locators.click(arg)
+            return (click_if_enabled,)
+        if op == "page":
+            def wait_for_page(automator, emed_no):
+                yield
+                automator._on_page(arg)
+            return (wait_for_page,)
+        if op == "settle":
+            return (lambda automator, emed_no: automator.waits.page_settled(),)
+        if op == "skip_if_completed":
+            return (lambda automator, emed_no: automator._skip_if_completed(emed_no),)
+        if op == "verify_case":
+            return (lambda automator, emed_no: automator._verify_case(emed_no),)
+        if op == "accept_alert":
+            def accept_alert(automator, emed_no):
+                automator.waits.alert()
+                Alert().accept()
+            return (accept_alert,)
+
+        # Block steps return their children's generator, or None when skipped
+        children = self._compile_steps(step["steps"], including, f"{where}.{op}")
+        if op == "span":
+            def run_span(automator, emed_no):
+                with automator.tracer.span(arg, emed_no):
+                    yield from self.run(children, automator, emed_no)
+            return (run_span,)
+        if op == "if_exists":
+            def run_if_exists(automator, emed_no):
+                if automator.locators.exists(arg):
+                    return self.run(children, automator, emed_no)
+                return None
+            return (run_if_exists,)
+
+        def run_if_enabled(automator, emed_no):
+            if automator.locators.exists(arg) and automator.locators.is_enabled(arg):
+                return self.run(children, automator, emed_no)
+            return None
+        return (run_if_enabled,)
+
+class EmedicalWebAutomator:
+    def __init__(self, base_url, wait_settings=None, lean=False, page_load_strategy=DEFAULT_PAGE_LOAD_STRATEGY, tracer=None,
+                 plans=None):
+        self.base_url = base_url
+        self.plans = plans or FormPlans.default()
+        self.tracer = tracer or Tracer()
+        self.lean = lean
+        self.page_load_strategy = page_load_strategy
+        # Measure network traffic per case even without lean browsing (for comparisons)
+        self.track_network = False
+        self.options = ChromeOptions()
+        self._setup_chrome_options()
+        self.api_impl = APIImpl()
+        self.waits = WaitEngine(self.api_impl, wait_settings)
+        self.locators = LocatorRegistry(self.api_impl, self.waits)
+        self.network = NetworkMonitor(self.api_impl)
+        self.monitor = BrowserMonitor(self.api_impl)
+        # Set findings radio buttons with one script call instead of one click each
+        self.fast_fill = True
+        # Whether the last case was skipped because the search results showed it as completed
+        self.already_completed = False
+        # Cases kept in flight in separate tabs of one session (see EmedicalWorkflowManager._run_pipelined)
+        self.pipeline_depth = 1
+        self._tab_locators = {}
+        self.last_error = None
+        self.last_case_seconds = None
+        # Kept from the last login so the watchdog can restart the session
+        self._credentials = None
+        self.consecutive_failures = 0
+
+    def spawn(self):
+        """Create another automator with its own, independent browser session."""
+        automator = EmedicalWebAutomator(self.base_url, self.waits.settings, self.lean, self.page_load_strategy, self.tracer,
+                                         self.plans)
+        automator.monitor.recycle_after = self.monitor.recycle_after
+        automator.fast_fill = self.fast_fill
+        automator.pipeline_depth = self.pipeline_depth
+        return automator
+
+    def configure_browser(self, lean=False, page_load_strategy=DEFAULT_PAGE_LOAD_STRATEGY, pipeline_depth=1):
+        """Choose lean browsing, the page-load strategy and the number of tabs for the next login."""
+        if page_load_strategy not in PAGE_LOAD_STRATEGIES:
+            raise ValueError(f"Unknown page load strategy: {page_load_strategy}")
+        self.lean = lean
+        self.page_load_strategy = page_load_strategy
+        self.pipeline_depth = max(1, min(pipeline_depth, MAX_PIPELINE_DEPTH))
+
+    def _activate(self):
+        """Bind Helium calls on the current thread to this automator's browser."""
+        _thread_local.api_impl = self.api_impl
+
+    def _setup_chrome_options(self):
+        self.options.page_load_strategy = self.page_load_strategy
+        self.options.add_argument("--disable-extensions")
+        self.options.add_argument("--incognito")
+        self.options.add_argument("--no-sandbox")
+        self.options.add_argument("--disable-gpu")
+        self.options.add_argument("--disable-background-networking")
+        self.options.add_argument("--disable-component-update")
+        self.options.add_argument("--disable-features=NetworkService,NetworkServiceInProcess")
+        if self.lean:
+            self.options.add_argument("--blink-settings=imagesEnabled=false")
+            self.options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+        if self.lean or self.track_network:
+            # Network events feed NetworkMonitor's per-case byte and blocked-request counts
+            self.options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+            self.options.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+    def _setup_lean_browsing(self):
+        """Block images, fonts, media and analytics in the running browser via DevTools."""
+        driver = self.api_impl.require_driver().unwrap()
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": LEAN_BLOCKED_URL_PATTERNS})
+
+    def login(self, user_id, password, headless=False):
+        self._activate()
+        self._credentials = (user_id, password, headless)
+        self.consecutive_failures = 0
+        self.monitor.new_browser()
+        with self.tracer.span("login") as span:
+            success = self._login(user_id, password, headless)
+            if not success:
+                span["outcome"] = "failed"
+            return success
+
+    def _login(self, user_id, password, headless):
+        for attempt in range(1, MAX_LOGIN_ATTEMPTS + 1):
+            try:
+                logging.info("Starting browser and logging into eMedical system")
+                self.options = ChromeOptions()
+                self._setup_chrome_options()
+                self.api_impl.start_chrome_impl(headless=headless, options=self.options)
+                if self.lean:
+                    self._setup_lean_browsing()
+                # Network figures are per browser and cannot be split between cases running side by side in tabs
+                self.network.enabled = (self.lean or self.track_network) and self.pipeline_depth == 1
+                self.api_impl.go_to_impl(self.base_url)
+                write(user_id, into=TextField('User id'))
+                write(password, into=TextField('Password'))
+                click(Button('Logon'))
+                self.waits.text('Case search')
+                logging.info("Login successful!")
+                return True
+
+            except NoSuchElementException:
+                logging.error("Login fields not found, please check if the page has changed")
+                break
+
+            except TimeoutException:
+                logging.warning(f"Login timed out, attempt {attempt}...")
+                sleep(2)
+
+            except WebDriverException as e:
+                logging.error(f"Browser error: {e}")
+                break
+
+        logging.error("Login failed after multiple attempts, please check your credentials")
+        return False
+
+    def quit(self):
+        """Close this automator's browser if it is running."""
+        self._activate()
+        driver = self.api_impl.get_driver_impl()
+        self.api_impl.driver = None
+        if driver is None:
+            return
+        finished, _ = self._call_with_timeout(driver.quit)
+        if not finished:
+            # The browser is hung; kill chromedriver rather than wait on it
+            logging.warning("Browser did not quit in time, killing its driver")
+            try:
+                driver.service.process.kill()
+            except Exception:
+                pass
+
+    @property
+    def is_running(self):
+        return self.api_impl.driver is not None
+
+    def _call_with_timeout(self, fn, timeout=WATCHDOG_PROBE_TIMEOUT):
+        """Call fn on a helper thread; returns (finished, result), finished being False if it raised or hung."""
+        outcome = []
+
+        def target():
+            try:
+                outcome.append(fn())
+            except Exception:
+                pass
+
+        thread = threading.Thread(target=target, name="watchdog-probe", daemon=True)
+        thread.start()
+        thread.join(timeout)
+        return (True, outcome[0]) if outcome else (False, None)
+
+    def check_health(self):
+        """Return why the session needs a restart (dead browser, logged out, repeated failures), or None."""
+        driver = self.api_impl.get_driver_impl()
+        if driver is None:
+            return "browser is not running"
+        responsive, logged_out = self._call_with_timeout(lambda: driver.execute_script(LOGGED_OUT_SCRIPT))
+        if not responsive:
+            return "browser is not responding"
+        if logged_out:
+            return "session was logged out"
+        if self.consecutive_failures >= MAX_CONSECUTIVE_FAILURES:
+            return f"{self.consecutive_failures} consecutive failures"
+        return None
+
+    def restart(self):
+        """Kill the browser, start a new one and log in again with the credentials of the last login."""
+        if self._credentials is None:
+            return False
+        self.quit()
+        return self.login(*self._credentials)
+
+    def _on_page(self, marker):
+        """Wait for the page identified by marker text and drop elements cached from the previous page."""
+        self.waits.text(marker)
+        self.locators.new_page()
+
+    def automate_cxr_exam(self, emed_no: str, country: str) -> bool:
+        case = self.cxr_exam(emed_no, country)
+        while True:
+            try:
+                next(case)
+            except StopIteration as done:
+                return done.value
+
+    def cxr_exam(self, emed_no, country):
+        """
+        Process one case as a generator that pauses before every page wait and
+        returns whether it succeeded. last_error and already_completed describe
+        the case once the generator has finished.
+        """
+        self._activate()
+        start = perf_counter()
+        with self.tracer.span("case", emed_no) as span:
+            success = yield from self._automate_cxr_exam(emed_no, country)
+            if not success:
+                span["outcome"] = "failed"
+        self.consecutive_failures = 0 if success else self.consecutive_failures + 1
+        self.last_case_seconds = perf_counter() - start
+        self.monitor.finish_case(success, self.last_case_seconds)
+        logging.info(f"Case {emed_no} {'succeeded' if success else 'failed'} in {self.last_case_seconds:.1f}s",
+                     extra={"emed_no": emed_no, "country": country, "step": "case",
+                            "duration": round(self.last_case_seconds, 3)})
+        return success
+
+    def open_tabs(self, count):
+        """Open tabs of the logged-in session up to count, each on Case search; return their window handles."""
+        driver = self.api_impl.require_driver().unwrap()
+        first = driver.current_window_handle
+        self._tab_locators = {first: self.locators}
+        for _ in range(count - 1):
+            driver.switch_to.new_window('tab')
+            driver.get(self.base_url)
+            self.waits.text('Case search')
+            self._tab_locators[driver.current_window_handle] = LocatorRegistry(
+                self.api_impl, self.waits, self.locators.compiled, self.locators._selectors
+            )
+        driver.switch_to.window(first)
+        return list(self._tab_locators)
+
+    def switch_to_tab(self, handle):
+        """Make the tab current for the browser and for this automator's locators."""
+        self.api_impl.require_driver().unwrap().switch_to.window(handle)
+        self.locators = self._tab_locators[handle]
+
+    # Returns the normalised status cell of the results row whose cell is exactly the eMedical No.,
+    # the column being that of the nearest header cell named in arguments[1]; null if there is none
+    _CASE_STATUS_JS = """
+        var emedNo = arguments[0].toLowerCase(), headers = arguments[1];
+        var norm = function(e) { return e.textContent.replace(/\\s+/g, ' ').trim().toLowerCase(); };
+        var cells = document.querySelectorAll('td, th'), row = null;
+        for (var i = 0; i < cells.length && row === null; i++) {
+            if (norm(cells[i]) === emedNo) row = cells[i].parentElement;
+        }
+        if (row === null) return null;
+        for (var scope = row.parentElement; scope; scope = scope.parentElement) {
+            var heads = scope.querySelectorAll('td, th');
+            for (var j = 0; j < heads.length; j++) {
+                if (heads[j].parentElement !== row && headers.indexOf(norm(heads[j])) >= 0) {
+                    var cell = row.cells[heads[j].cellIndex];
+                    return cell ? norm(cell) : null;
+                }
+            }
+        }
+        return null;
+    """
+
+    def _skip_if_completed(self, emed_no):
+        """Stop the plan if the status cell of the case's search result row is one of COMPLETED_CASE_STATUSES."""
+        driver = self.api_impl.require_driver().unwrap()
+        status = driver.execute_script(self._CASE_STATUS_JS, emed_no, list(CASE_STATUS_HEADERS))
+        if status is None:
+            logging.debug(f"No status found for {emed_no} in the search results, treating the case as outstanding")
+        elif status in COMPLETED_CASE_STATUSES:
+            raise CaseAlreadyCompleted(status)
+
+    # Whether an element of the page holds nothing but the case ID arguments[0] (already normalised),
+    # as the case pages do; a mention of it inside other text does not count
+    _SHOWS_CASE_JS = """
+        var emedNo = arguments[0];
+        var elements = document.body ? document.body.getElementsByTagName('*') : [];
+        for (var i = 0; i < elements.length; i++) {
+            var e = elements[i];
+            if (e.children.length === 0 && e.textContent.replace(/\\s+/g, ' ').trim().toLowerCase() === emedNo) return true;
+        }
+        return false;
+    """
+
+    def _verify_case(self, emed_no):
+        """
+        Stop the plan unless the current page shows the eMedical No., so nothing is submitted
+        for another case. Only needed with several tabs, where another tab can switch the case.
+        """
+        if self.pipeline_depth == 1:
+            return
+        driver = self.api_impl.require_driver().unwrap()
+        if not driver.execute_script(self._SHOWS_CASE_JS, emed_no.strip().casefold()):
+            raise CaseMismatch(f"The page does not show {emed_no}, not submitting")
+
+    def _fill_choices(self, names):
+        """Select the CHOICE_FIELDS on the current page, by fast fill if enabled, else (or if it fails) by clicking."""
+        loc = self.locators
+        if self.fast_fill and loc.fill(names):
+            return
+        for name in names:
+            if CHOICE_FIELDS[name][2]:
+                for element in loc.find_all(name):
+                    if not element.is_selected():
+                        element.click()
+            else:
+                loc.select(name)
+
+    def _automate_cxr_exam(self, emed_no, country):
+        # The outcome attributes are only set in the case's last step, as cases in other tabs
+        # may run between its steps
+        steps = self.plans.plan_for(country)
+        if steps is None:
+            self.last_error = f"No form plan for {country}"
+            self.already_completed = False
+            logging.error(f"Automation failed for: {emed_no}, Error: {self.last_error}")
+            return False
+
+        self.network.start_case()
+        loc = self.locators
+        try:
+            loc.new_page()
+            yield from FormPlans.run(steps, self, emed_no)
+            logging.info(f"Successfully processed ({country}): {emed_no}")
+            self.last_error = None
+            self.already_completed = False
+            self.network.finish_case(emed_no)
+            return True
+
+        except CaseAlreadyCompleted as e:
+            logging.info(f"Already completed ({country}): {emed_no}, status: {e}")
+            self.last_error = None
+            self.already_completed = True
+            try:
+                if loc.exists('close') and loc.is_enabled('close'):
+                    loc.click('close')
+            except WebDriverException:
+                pass
+            self.network.finish_case(emed_no)
+            return True
+
+        except (CaseMismatch, NoSuchElementException, TimeoutException, WebDriverException) as e:
+            logging.error(f"Automation failed for: {emed_no}, Error: {e}")
+            self.last_error = e
+            self.already_completed = False
+            try:
+                loc.new_page()
+                if loc.exists('close') and loc.is_enabled('close'):
+                    loc.click('close')
+            except Exception:
+                pass
+            self.network.finish_case(emed_no)
+            return False
+
+class CheckpointJournal:
+    """
+    Append-only JSONL record of each eMedical No.'s processing state, used to resume interrupted runs.
+    """
+    PENDING = "pending"
+    IN_PROGRESS = "in_progress"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+
+    def __init__(self, path=journal_file):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        # Latest record of each eMedical No., so lookups stay O(1)
+        self._entries = {}
+        self._load()
+        self._file = open(self.path, 'a', encoding='utf-8')
+
+    def _load(self):
+        if not self.path.exists():
+            return
+        lines = 0
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                lines += 1
+                try:
+                    entry = json.loads(line)
+                    self._entries[entry["emed_no"]] = entry
+                except (ValueError, KeyError):
+                    # A torn last line from a crash mid-write
+                    logging.warning(f"Skipping unreadable journal line {lines} in {self.path}")
+        if lines > 2 * len(self._entries) + 1000:
+            self._compact()
+
+    def _compact(self):
+        """Rewrite the journal with only the latest record of each eMedical No."""
+        tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            for entry in self._entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+
+    def state(self, emed_no):
+        """Return the last recorded state of the eMedical No., or None if it was never seen."""
+        entry = self._entries.get(emed_no)
+        return entry["state"] if entry else None
+
+    def is_completed(self, emed_no):
+        return self.state(emed_no) == self.SUCCEEDED
+
+    def record(self, emed_no, state, error=None):
+        """Append a state change; finished states are fsynced so they survive a crash. A no-op once closed."""
+        entry = {"emed_no": emed_no, "state": state, "time": datetime.now().isoformat(timespec='seconds')}
+        if error:
+            entry["error"] = str(error)
+        with self._lock:
+            self._entries[emed_no] = entry
+            if self._file.closed:
+                # A worker still finishing after close(), e.g. when the GUI is closed mid-run
+                return
+            self._file.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            self._file.flush()
+            if state in (self.SUCCEEDED, self.FAILED):
+                os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+class ResultWriter:
+    """
+    Buffers the final outcome of each eMedical No. and writes them into the workbooks
+    they were read from, one save per workbook at the end of the run (and every
+    WATCH_WRITE_BACK_INTERVAL seconds while watching a folder).
+
+    Succeeded rows get WRITE_BACK_FILL on their eMedical No. cell, so the next
+    extraction skips them; every row gets a status and a timestamp column. A row
+    is only written while it still holds its eMedical No.; if the sheet was sorted
+    or edited since it was read, the number is looked up again, and skipped if it
+    is gone. Each workbook is saved to a temporary file and atomically replaces
+    the original.
+
+    openpyxl rewrites the whole workbook: cached formula results (formulas are
+    kept but show no value until Excel recalculates), images and charts are lost.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Held for a whole commit, so two commits never write the same workbook at once
+        self._commit_lock = threading.Lock()
+        # file -> {emed_no: (sheet, row, success, time)}
+        self._results = {}
+
+    def __len__(self):
+        return sum(len(rows) for rows in self._results.values())
+
+    def record(self, emed_no, source, success):
+        """Buffer the outcome of the eMedical No. read from source, a (file, sheet, row) tuple."""
+        path, sheet, row = source
+        with self._lock:
+            self._results.setdefault(path, {})[emed_no] = (sheet, row, success, datetime.now().replace(microsecond=0))
+
+    def commit(self):
+        """Write the buffered outcomes into their workbooks; returns the number of rows written."""
+        with self._commit_lock:
+            with self._lock:
+                results, self._results = self._results, {}
+            written = 0
+            for path, rows in results.items():
+                try:
+                    written += self._write(Path(path), rows)
+                except Exception as e:
+                    # Typically the workbook is open in Excel; the original is left untouched
+                    logging.error(f"Could not write results back to {path}: {e}")
+            return written
+
+    def _write(self, path, rows):
+        """Write the outcomes of one workbook and return how many rows were written."""
+        wb = load_workbook(path)
+        fill = PatternFill("solid", fgColor=WRITE_BACK_FILL)
+        by_sheet = {}
+        for emed_no, (sheet, row, success, when) in rows.items():
+            by_sheet.setdefault(sheet, []).append((emed_no, row, success, when))
+        written = 0
+        for sheet, outcomes in by_sheet.items():
+            if sheet not in wb.sheetnames:
+                logging.warning(f"Sheet {sheet} no longer in {path}, {len(outcomes)} results not written")
+                continue
+            ws = wb[sheet]
+            headers = self._find_headers(ws)
+            if not headers:
+                logging.warning(f"'eMedical No.' field not found in sheet {sheet} of {path}, results not written")
+                continue
+            # The status columns go in the first header row
+            status_column = self._column(ws, headers[0][0], WRITE_BACK_STATUS_HEADER)
+            time_column = self._column(ws, headers[0][0], WRITE_BACK_TIME_HEADER)
+            rows_by_number = None
+            for emed_no, row, success, when in outcomes:
+                emed_column = next((column for header_row, column in headers
+                                    if row > header_row and str(ws.cell(row=row, column=column).value) == emed_no), None)
+                if emed_column is None:
+                    # The sheet changed since it was read: find the number's new row
+                    if rows_by_number is None:
+                        rows_by_number = self._rows_by_number(ws, headers)
+                    if emed_no not in rows_by_number:
+                        logging.warning(f"{emed_no} no longer in sheet {sheet} of {path}, result not written")
+                        continue
+                    row, emed_column = rows_by_number[emed_no]
+                written += 1
+                if success:
+                    ws.cell(row=row, column=emed_column).fill = fill
+                ws.cell(row=row, column=status_column, value="succeeded" if success else "failed")
+                ws.cell(row=row, column=time_column, value=when).number_format = "yyyy-mm-dd hh:mm:ss"
+
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        try:
+            wb.save(tmp_path)
+            with open(tmp_path, 'rb+') as f:
+                os.fsync(f.fileno())
+            os.replace(tmp_path, path)
+        finally:
+            if tmp_path.exists():
+                tmp_path.unlink()
+        logging.info(f"Wrote {written} results back to {path}")
+        return written
+
+    @staticmethod
+    def _rows_by_number(ws, headers):
+        """Return {eMedical No.: (row, column)} of the first cell holding it below one of the headers."""
+        rows = {}
+        for header_row, column in headers:
+            for row, (value,) in enumerate(ws.iter_rows(min_row=header_row + 1, min_col=column, max_col=column,
+                                                        values_only=True), start=header_row + 1):
+                if value is not None:
+                    rows.setdefault(str(value), (row, column))
+        return rows
+
+    @staticmethod
+    def _find_headers(ws):
+        """Return the 1-based (row, column) of every 'eMedical No.' header, as ExcelProcessor finds them."""
+        headers = []
+        columns = set()
+        for row in ws.iter_rows():
+            for idx in ExcelProcessor._find_header_columns(row):
+                # ExcelProcessor reads each column below its first header only
+                if idx not in columns:
+                    columns.add(idx)
+                    headers.append((row[idx].row, idx + 1))
+        return headers
+
+    @staticmethod
+    def _column(ws, header_row, header):
+        """Return the column headed `header`, adding it after the last column if the sheet has none."""
+        for cell in ws[header_row]:
+            if cell.value == header:
+                return cell.column
+        column = ws.max_column + 1
+        ws.cell(row=header_row, column=column, value=header)
+        return column
+
+class CaseStatusIndex:
+    """
+    Server-side status of cases seen in earlier runs, trusted for `ttl` seconds.
+
+    Numbers whose 502 exam is known to be completed are dropped before any
+    browser work; everything else is opened as usual.
+    """
+    COMPLETED = "completed"
+
+    def __init__(self, path=case_status_file, ttl=CASE_STATUS_TTL):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # eMedical No. -> (status, time it was seen)
+        self._entries = {}
+        self._dirty = False
+        if self.path.exists():
+            try:
+                with open(self.path, encoding='utf-8') as f:
+                    self._entries = {emed_no: tuple(entry) for emed_no, entry in json.load(f).items()}
+            except (OSError, ValueError, TypeError, AttributeError):
+                logging.warning(f"Ignoring unreadable case status index {self.path}")
+
+    def status(self, emed_no):
+        """Return the case's status if it was seen within the TTL, otherwise None."""
+        entry = self._entries.get(emed_no)
+        if entry is None or time() - entry[1] > self.ttl:
+            return None
+        return entry[0]
+
+    def is_completed(self, emed_no):
+        return self.status(emed_no) == self.COMPLETED
+
+    def record(self, emed_no, status):
+        with self._lock:
+            self._entries[emed_no] = (status, time())
+            self._dirty = True
+
+    def save(self):
+        """Write the index, without expired entries, if it changed."""
+        with self._lock:
+            if not self._dirty:
+                return
+            now = time()
+            entries = {emed_no: entry for emed_no, entry in self._entries.items() if now - entry[1] <= self.ttl}
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+            self._entries = entries
+            self._dirty = False
+
+class RetryScheduler:
+    """
+    Classifies failures and holds transiently failed eMedical No. until their backoff expires.
+
+    Workers drain the main queue first, then take due retries from here; once no
+    retries are pending and no worker is still processing, every worker is released.
+    """
+    TRANSIENT = "transient"
+    PAGE_CHANGED = "page_changed"
+    PERMANENT = "permanent"
+
+    def __init__(self, max_retries=MAX_RETRIES, base_delay=RETRY_BASE_DELAY, max_delay=RETRY_MAX_DELAY):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        # Workers that are processing and may still schedule retries
+        self._busy = 0
+        # Set by drain(): no worker is left to take retries
+        self._closed = False
+
+    @classmethod
+    def classify(cls, error):
+        """Return TRANSIENT, PAGE_CHANGED or PERMANENT for the error a case failed with."""
+        if isinstance(error, CaseMismatch):
+            # Another tab of the session switched the case; opening it again on its own sets it right
+            return cls.TRANSIENT
+        if isinstance(error, NoSuchElementException):
+            # An expected element is missing: the layout changed or the case is in an unexpected state
+            return cls.PAGE_CHANGED
+        if isinstance(error, WebDriverException):
+            # Timeouts, stale or covered elements and dropped connections usually clear up on their own
+            return cls.TRANSIENT
+        return cls.PERMANENT
+
+    def backoff(self, attempt):
+        """Seconds to wait before the given retry attempt (1-based)."""
+        return min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+
+    def acquire(self):
+        """Mark the calling worker as busy until it asks for its next retry."""
+        with self._cond:
+            self._busy += 1
+
+    def release(self):
+        """Mark the calling worker as gone without taking retries, e.g. after a failed login."""
+        with self._cond:
+            self._busy -= 1
+            self._cond.notify_all()
+
+    def schedule(self, index, emed_no, attempt):
+        """Queue a retry; returns the backoff in seconds, or None once the eMedical No. is out of retries."""
+        if attempt > self.max_retries:
+            return None
+        delay = self.backoff(attempt)
+        with self._cond:
+            if self._closed:
+                return None
+            heapq.heappush(self._heap, (perf_counter() + delay, next(self._seq), index, emed_no, attempt))
+            self._cond.notify_all()
+        return delay
+
+    def next_retry(self):
+        """
+        Release the calling worker and block until a retry is due.
+
+        Returns (index, emed_no, attempt), marking the worker busy again, or None
+        when nothing is left to retry or the workflow was stopped.
+        """
+        with self._cond:
+            self._busy -= 1
+            self._cond.notify_all()
+            while not stop_event.is_set():
+                if self._heap:
+                    wait = self._heap[0][0] - perf_counter()
+                    if wait <= 0:
+                        _, _, index, emed_no, attempt = heapq.heappop(self._heap)
+                        self._busy += 1
+                        return index, emed_no, attempt
+                elif self._busy == 0:
+                    return None
+                else:
+                    wait = 0.5
+                # Wake up periodically so a stop request is noticed
+                self._cond.wait(min(wait, 0.5))
+            return None
+
+    def drain(self):
+        """Stop taking retries and return the (index, emed_no, attempt) still waiting, soonest due first."""
+        with self._cond:
+            self._closed = True
+            retries = [entry[2:] for entry in sorted(self._heap)]
+            self._heap.clear()
+            self._cond.notify_all()
+        return retries
+
+class WorkScheduler:
+    """
+    Queue of eMedical No. waiting for a browser, grouped by country and handed out by policy.
+
+    Used like queue.Queue: put((index, emed_no)) to add work and put(None) once per
+    worker when input ends; get() returns an item, or None once everything was handed
+    out. Country affinity is per calling thread, i.e. per browser. Finished cases are
+    timed per country, for the "shortest" policy and for the throughput report.
+    """
+    def __init__(self, policy=DEFAULT_SCHEDULING_POLICY, country_of=None):
+        if policy not in SCHEDULING_POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        self.policy = policy
+        self.country_of = country_of or (lambda emed_no: UNKNOWN_COUNTRY)
+        self._cond = threading.Condition()
+        # Country -> deque of (sequence, item) in arrival order
+        self._pending = {}
+        self._seq = itertools.count()
+        self._ends = 0
+        # Thread id -> country of the last item it got
+        self._last_country = {}
+        # Times a browser moved on to another country's form flow
+        self.switches = 0
+        # Country -> [cases, succeeded, seconds]
+        self.countries = {}
+
+    def put(self, item):
+        with self._cond:
+            if item is None:
+                self._ends += 1
+            else:
+                country = self.country_of(item[1])
+                self._pending.setdefault(country, deque()).append((next(self._seq), item))
+            self._cond.notify()
+
+    def get(self, block=True):
+        """Return the next item for the calling thread; raises queue.Empty if none is ready and block is False."""
+        with self._cond:
+            while True:
+                country = self._choose(self._last_country.get(threading.get_ident()))
+                if country is not None:
+                    break
+                if self._ends:
+                    self._ends -= 1
+                    return None
+                if not block:
+                    raise queue.Empty
+                self._cond.wait()
+            waiting = self._pending[country]
+            _, item = waiting.popleft()
+            if not waiting:
+                del self._pending[country]
+            last = self._last_country.get(threading.get_ident())
+            if last is not None and last != country:
+                self.switches += 1
+            self._last_country[threading.get_ident()] = country
+            return item
+
+    def _choose(self, last):
+        """Return the country to take the next item from, or None if nothing is pending."""
+        if not self._pending:
+            return None
+        if self.policy == "fifo":
+            return min(self._pending, key=lambda country: self._pending[country][0][0])
+        if self.policy == "shortest":
+            # Countries not timed yet count as quickest, so each is measured early on
+            return min(self._pending, key=lambda country: (self.mean_seconds(country) or 0.0, self._pending[country][0][0]))
+        if last in self._pending:
+            return last
+        # Start on the largest group, so the longest run of one flow comes first
+        return max(self._pending, key=lambda country: (len(self._pending[country]), -self._pending[country][0][0]))
+
+    def finished(self, country, success, seconds):
+        """Record how long a case of the country took."""
+        with self._cond:
+            entry = self.countries.setdefault(country, [0, 0, 0.0])
+            entry[0] += 1
+            entry[1] += success
+            entry[2] += seconds
+
+    def mean_seconds(self, country):
+        entry = self.countries.get(country)
+        return entry[2] / entry[0] if entry else None
+
+    def log_summary(self):
+        """Log cases, success and throughput per country."""
+        for country, (cases, succeeded, seconds) in sorted(self.countries.items()):
+            logging.info(f"{country}: {cases} cases ({succeeded} succeeded), {seconds / cases:.1f}s per case, "
+                         f"{60 * cases / seconds if seconds else 0:.1f} cases/min per browser")
+        if self.countries:
+            logging.info(f"Scheduling ({self.policy}): {self.switches} switches between country form flows")
+
+class ResultStore:
+    """
+    Compact record of a batch: the eMedical No. in arrival order, one state byte
+    per item, and the positions of succeeded and failed items in completion order.
+    Counts are kept incrementally, so views never have to walk the batch.
+    """
+    PENDING = 0
+    PROCESSING = 1
+    SUCCEEDED = 2
+    FAILED = 3
+
+    def __init__(self):
+        self.clear()
+
+    def clear(self):
+        self.emed_nos = []
+        self.states = bytearray()
+        self.succeeded = array('I')
+        self.failed = array('I')
+        self.counts = [0, 0, 0, 0]
+        self._index_of = {}
+
+    def __len__(self):
+        return len(self.emed_nos)
+
+    def add(self, emed_no):
+        """Append a pending eMedical No. and return its index."""
+        index = len(self.emed_nos)
+        self.emed_nos.append(emed_no)
+        self.states.append(self.PENDING)
+        self.counts[self.PENDING] += 1
+        self._index_of[emed_no] = index
+        return index
+
+    def index_of(self, emed_no):
+        """Return the index of the most recently added occurrence of the eMedical No., or None."""
+        return self._index_of.get(emed_no)
+
+    def set_state(self, index, state):
+        old_state = self.states[index]
+        if old_state == state:
+            return
+        self.states[index] = state
+        self.counts[old_state] -= 1
+        self.counts[state] += 1
+        if state == self.SUCCEEDED:
+            self.succeeded.append(index)
+        elif state == self.FAILED:
+            self.failed.append(index)
+
+class EmedicalWorkflowManager:
+    """
+    A class to orchestrate the overall eMedical automation workflow.
+    """
+    def __init__(self, excel_processor, web_automator, journal=None, case_index=None):
+        self.excel_processor = excel_processor
+        self.web_automator = web_automator
+        self.journal = journal
+        self.case_index = case_index
+        # Where to export the run's step trace (.jsonl, .csv or Chrome trace .json); None to skip
+        self.trace_path = None
+        # Callbacks for GUI updates
+        self.update_status_callback = None
+        self.update_emed_no_listbox_callback = None
+        self.update_success_listbox_callback = None
+        self.update_failure_listbox_callback = None
+        self.update_counts_callback = None
+        self.clear_listboxes_callback = None
+        # Serializes callbacks when several workers report results at once
+        self._callback_lock = threading.Lock()
+        # Outcome counts of the last run, see _reset_stats
+        self.stats = {}
+        # eMedical No. -> (file, sheet, row) it was read from in the last run
+        self.sources = {}
+        # Set to a ResultWriter to write outcomes back into the source workbooks
+        self.result_writer = None
+        self.retry_scheduler = None
+        # Workers of the current run not yet stopped, and set once the last one stopped with its browser lost
+        self._live_workers = 0
+        self.workers_lost = threading.Event()
+        # One of SCHEDULING_POLICIES, see WorkScheduler
+        self.scheduling_policy = DEFAULT_SCHEDULING_POLICY
+        self.work_scheduler = None
+
+    def set_gui_callbacks(self, update_status, update_emed_no_listbox, update_success_listbox, update_failure_listbox, update_counts, clear_listboxes):
+        """Set the callback functions for GUI updates."""
+        self.update_status_callback = update_status
+        self.update_emed_no_listbox_callback = update_emed_no_listbox
+        self.update_success_listbox_callback = update_success_listbox
+        self.update_failure_listbox_callback = update_failure_listbox
+        self.update_counts_callback = update_counts
+        self.clear_listboxes_callback = clear_listboxes
+
+    def start_workflow(self, user_id, password, excel_path, headless, close_browser, workers=DEFAULT_WORKERS, resume=False,
+                       retries=MAX_RETRIES):
+        """
+        Start the eMedical automation workflow.
+
+        excel_path may be a single workbook or a list of them. Transient failures are
+        retried up to `retries` times at the end of the batch. Returns False if the
+        run was aborted before any case was processed, otherwise True.
+        """
+        if not self.update_status_callback:
+            logging.error("GUI update callbacks are not set.")
+            return False
+
+        emedical_numbers = self._read_numbers(excel_path)
+        if emedical_numbers is None:
+            return False
+        return self.process_numbers(user_id, password, emedical_numbers, headless, close_browser, workers, resume, retries)
+
+    def watch_folder(self, user_id, password, folder, headless, workers=DEFAULT_WORKERS):
+        """
+        Run as a service: keep the browsers logged in and process the new eMedical No. of
+        Excel files landing in folder until stop_workflow() is called.
+
+        Numbers completed according to the journal are skipped. Failed numbers are
+        not retried while the service runs (the queue never drains); they are picked
+        up again the next time the service starts. With write-back, results are
+        written every WATCH_WRITE_BACK_INTERVAL seconds, so a crash loses few.
+        """
+        if not self.update_status_callback:
+            logging.error("GUI update callbacks are not set.")
+            return False
+        if not Path(folder).is_dir():
+            self.update_status_callback(f"Error: Folder {folder} not found")
+            return False
+
+        def on_file(path, new):
+            with self._callback_lock:
+                self.update_status_callback(f"{path.name}: {new} new eMedical No.")
+        # Stop watching once every browser is lost; the service then ends with what was read failed
+        watcher = FolderWatcher(folder, self.excel_processor, on_file=on_file, stop=self.workers_lost)
+        self.sources = watcher.sources
+
+        done = threading.Event()
+
+        def write_back_periodically():
+            while not done.wait(WATCH_WRITE_BACK_INTERVAL):
+                self._write_back()
+        write_back = threading.Thread(target=write_back_periodically, name="write-back", daemon=True)
+        write_back.start()
+        try:
+            return self.process_numbers(user_id, password, iter(watcher), headless, close_browser=True,
+                                        workers=workers, resume=True, retries=0)
+        finally:
+            done.set()
+            write_back.join()
+
+    def _read_numbers(self, excel_path):
+        """
+        Return an iterator streaming the distinct eMedical No. of the workbook(s) and
+        folder(s), or None after reporting why there are none. Where each number was
+        read from is kept in self.sources.
+        """
+        excel_paths = [excel_path] if isinstance(excel_path, (str, Path)) else list(excel_path)
+        self.update_status_callback(f"Reading eMedical No. from {', '.join(str(p) for p in excel_paths)}")
+        for path in excel_paths:
+            if not Path(path).exists():
+                self.update_status_callback(f"Error: File {path} not found")
+                return None
+
+        # Stream numbers from the workbooks so logging in overlaps with reading the files
+        self.sources = {}
+
+        def emedical_numbers(entries):
+            for emed_no, source in entries:
+                self.sources[emed_no] = source
+                yield emed_no
+        numbers = emedical_numbers(self.excel_processor.iter_sources(excel_paths))
+        first_emed_no = next(numbers, None)
+        if first_emed_no is None:
+            self.update_status_callback("No eMedical No. read.")
+            return None
+        return itertools.chain([first_emed_no], numbers)
+
+    def process_numbers(self, user_id, password, emedical_numbers, headless, close_browser, workers=DEFAULT_WORKERS,
+                        resume=False, retries=MAX_RETRIES):
+        """Process an iterable of eMedical No. as start_workflow does for the numbers of a workbook."""
+        stop_event.clear()
+        self.web_automator.tracer.clear()
+        self._reset_stats()
+        self.retry_scheduler = RetryScheduler(max_retries=retries)
+        self.workers_lost.clear()
+
+        if self.clear_listboxes_callback:
+            self.clear_listboxes_callback()
+
+        # Every worker drives its own browser; the first reuses our automator.
+        workers = max(1, min(workers, MAX_WORKERS))
+        automators = [self.web_automator] + [self.web_automator.spawn() for _ in range(workers - 1)]
+        logged_in = []
+        self._live_workers = workers
+
+        work_queue = self.work_scheduler = WorkScheduler(self.scheduling_policy, self._get_country)
+        reader = threading.Thread(
+            target=self._feed_queue,
+            args=(emedical_numbers, work_queue, workers, resume),
+            name="excel-reader",
+            daemon=True
+        )
+        reader.start()
+
+        if workers == 1:
+            self._run_worker(automators[0], user_id, password, headless, close_browser, work_queue, logged_in)
+        else:
+            logging.info(f"Starting {workers} workers")
+            threads = [
+                threading.Thread(
+                    target=self._run_worker,
+                    args=(automator, user_id, password, headless, close_browser, work_queue, logged_in),
+                    name=f"worker-{worker_id}",
+                    daemon=True
+                )
+                for worker_id, automator in enumerate(automators, start=1)
+            ]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        reader.join()
+        # Every browser was lost with work left: report what no worker is left to process
+        if self.workers_lost.is_set() and logged_in and not stop_event.is_set():
+            self._fail_remaining(work_queue)
+
+        if self.case_index:
+            self.case_index.save()
+        self._write_back()
+
+        tracer = self.web_automator.tracer
+        if self.trace_path:
+            tracer.export(self.trace_path)
+
+        if not logged_in:
+            self.update_status_callback("Login failed, please check your credentials")
+            return False
+
+        tracer.log_summary()
+        self.work_scheduler.log_summary()
+        self._log_stats()
+
+        if stop_event.is_set():
+            self.update_status_callback("Processing stopped by user")
+
+        for automator in logged_in:
+            network = automator.network.summary()
+            if network:
+                logging.info(f"Network usage: {network[0]:.0f} KB received, {network[1]:.1f} requests blocked, "
+                             f"{network[2]:.1f}s per case over {len(automator.network.cases)} cases")
+
+        if self.update_counts_callback:
+            self.update_counts_callback() # Ensure final counts are updated on GUI
+
+        if self.workers_lost.is_set() and not stop_event.is_set():
+            self.update_status_callback("Processing ended: no browser session left")
+            logging.error("Processing ended: no browser session left")
+            return True
+        self.update_status_callback("Processing complete!")
+        logging.info("Processing complete!")
+        return True
+
+    def _feed_queue(self, emedical_numbers, work_queue, workers, resume=False):
+        """Push streamed eMedical No. onto the work queue, then signal every worker that input has ended."""
+        count = 0
+        skipped = 0
+        known_completed = 0
+        try:
+            for emed_no in emedical_numbers:
+                if stop_event.is_set():
+                    break
+                if resume and self.journal and self.journal.is_completed(emed_no):
+                    skipped += 1
+                    continue
+                # Pre-flight: a case recently seen as completed on the server is not opened again
+                if self.case_index and self.case_index.is_completed(emed_no):
+                    known_completed += 1
+                    continue
+                with self._callback_lock:
+                    if self.update_emed_no_listbox_callback:
+                        self.update_emed_no_listbox_callback(emed_no)
+                if self.journal:
+                    self.journal.record(emed_no, CheckpointJournal.PENDING)
+                work_queue.put((count, emed_no))
+                count += 1
+        finally:
+            for _ in range(workers):
+                work_queue.put(None)
+
+        if skipped:
+            logging.info(f"Resume: skipped {skipped} completed eMedical No.")
+        if known_completed:
+            logging.info(f"Case status index: skipped {known_completed} eMedical No. completed on the server")
+        skipped += known_completed
+        with self._callback_lock:
+            self.update_status_callback(f"Read {count} eMedical No." + (f" ({skipped} already completed)" if skipped else ""))
+
+    def _run_worker(self, automator, user_id, password, headless, close_browser, work_queue, logged_in):
+        """Log in one browser session and process queued eMedical No., then due retries, until both are drained."""
+        scheduler = self.retry_scheduler
+        scheduler.acquire()
+        if not automator.login(user_id, password, headless):
+            scheduler.release()
+            self._worker_stopped(lost=True)
+            return
+        logged_in.append(automator)
+
+        if automator.pipeline_depth == 1 or not self._run_pipelined(automator, work_queue):
+            while not stop_event.is_set() and automator.is_running:
+                item = work_queue.get()
+                if item is None:
+                    break
+                index, emed_no = item
+                self._process_item(automator, index, emed_no)
+                self._recycle_browser(automator)
+
+        while automator.is_running:
+            item = scheduler.next_retry()
+            if item is None:
+                break
+            self._process_item(automator, *item)
+            self._recycle_browser(automator)
+
+        if not automator.is_running:
+            logging.error("Stopping worker: its browser session could not be restored")
+            scheduler.release()
+        self._worker_stopped(lost=not automator.is_running)
+
+        if close_browser or headless:
+            logging.info("Closing browser")
+            automator.quit()
+
+    def _worker_stopped(self, lost):
+        """Count a worker out; if it is the last and stopped without its browser, no one is left to take work."""
+        with self._callback_lock:
+            self._live_workers -= 1
+            if self._live_workers == 0 and lost:
+                self.workers_lost.set()
+
+    def _fail_remaining(self, work_queue):
+        """Report every eMedical No. still queued or waiting for a retry as failed."""
+        # Close the retry scheduler first so failing the queued numbers cannot schedule new retries
+        remaining = self.retry_scheduler.drain()
+        while True:
+            try:
+                item = work_queue.get(block=False)
+            except queue.Empty:
+                break
+            if item is None:
+                break
+            remaining.append((*item, 0))
+        if not remaining:
+            return
+        logging.error(f"No browser session left: failing {len(remaining)} unprocessed eMedical No.")
+        with self._callback_lock:
+            self.update_status_callback(f"No browser session left: {len(remaining)} eMedical No. not processed")
+        error = WebDriverException("Browser session lost")
+        for index, emed_no, attempt in remaining:
+            with log_context(emed_no=emed_no):
+                self._finish_item(self.web_automator, index, emed_no, attempt, False, error)
+
+    def _run_pipelined(self, automator, work_queue):
+        """
+        Process queued eMedical No. with up to automator.pipeline_depth cases in flight,
+        each in its own tab of the one logged-in browser: whenever a case waits for
+        the server, the case in the next tab takes its next step. Returns False,
+        having taken nothing from the queue, if the tabs cannot be opened.
+        """
+        try:
+            tabs = automator.open_tabs(automator.pipeline_depth)
+        except WebDriverException as e:
+            logging.warning(f"Could not open tabs, processing one case at a time: {e}")
+            return False
+        idle = deque(tabs)
+        # (tab, index, emed_no, country, case generator) in the order they take steps
+        running = deque()
+        # Cases cut short by a session restart, run again once in the new session
+        rerun = deque()
+        rerun_once = set()
+        exhausted = False
+
+        while automator.is_running:
+            draining = automator.monitor.recycle_reason() is not None
+            while idle and not draining and not stop_event.is_set() and (rerun or not exhausted):
+                if rerun:
+                    index, emed_no, country = rerun.popleft()
+                else:
+                    try:
+                        item = work_queue.get(block=not running)
+                    except queue.Empty:
+                        break
+                    if item is None:
+                        exhausted = True
+                        break
+                    index, emed_no = item
+                    with log_context(emed_no=emed_no):
+                        country = self._start_item(index, emed_no)
+                    if country == UNKNOWN_COUNTRY:
+                        self._finish_item(automator, index, emed_no, 0, False, "Unknown country")
+                        continue
+                tab = idle.popleft()
+                automator.switch_to_tab(tab)
+                running.append((tab, index, emed_no, country, automator.cxr_exam(emed_no, country)))
+
+            if not running:
+                if stop_event.is_set() or (exhausted and not rerun):
+                    break
+                if draining:
+                    # Recycle only once every tab is idle, so no case is cut short
+                    self._recycle_browser(automator)
+                    if automator.is_running:
+                        tabs = self._reopen_tabs(automator)
+                        idle = deque(tabs)
+                continue
+
+            tab, index, emed_no, country, case = running.popleft()
+            automator.switch_to_tab(tab)
+            # One thread interleaves several cases, so the log context is set per step
+            try:
+                with log_context(emed_no=emed_no, country=country):
+                    next(case)
+                running.append((tab, index, emed_no, country, case))
+                continue
+            except StopIteration as done:
+                success = done.value
+            idle.append(tab)
+
+            if not success and emed_no not in rerun_once and self._recover_session(automator):
+                # The restart closed every tab; run this case and those in flight again
+                rerun_once.add(emed_no)
+                rerun.append((index, emed_no, country))
+                for _, other_index, other_emed_no, other_country, other_case in running:
+                    other_case.close()
+                    rerun.append((other_index, other_emed_no, other_country))
+                running.clear()
+                tabs = self._reopen_tabs(automator)
+                idle = deque(tabs)
+                continue
+            with log_context(emed_no=emed_no, country=country):
+                self._finish_item(automator, index, emed_no, 0, success, automator.last_error, automator.last_case_seconds)
+
+        # Only left over if the session could not be restored; let the retry scheduler hand them to other workers
+        lost = [(index, emed_no) for index, emed_no, _ in rerun]
+        for _, index, emed_no, _, case in running:
+            case.close()
+            lost.append((index, emed_no))
+        for index, emed_no in lost:
+            self._finish_item(automator, index, emed_no, 0, False, WebDriverException("Browser session lost"))
+
+        if automator.is_running:
+            automator.switch_to_tab(tabs[0])
+        return True
+
+    def _reopen_tabs(self, automator):
+        """Open the pipeline's tabs in a new session; on failure stop the browser and return no tabs."""
+        try:
+            return automator.open_tabs(automator.pipeline_depth)
+        except WebDriverException as e:
+            logging.error(f"Could not open tabs in the new browser session: {e}")
+            automator.quit()
+            return []
+
+    def _process_item(self, automator, index, emed_no, attempt=0):
+        """Process a single eMedical No. and report the result through the GUI callbacks."""
+        with log_context(emed_no=emed_no):
+            self._process_case(automator, index, emed_no, attempt)
+
+    def _process_case(self, automator, index, emed_no, attempt):
+        """Body of _process_item, run inside the case's log context."""
+        country = self._start_item(index, emed_no, attempt)
+        if country == UNKNOWN_COUNTRY:
+            self._finish_item(automator, index, emed_no, attempt, False, "Unknown country")
+            return
+
+        with log_context(country=country):
+            success = automator.automate_cxr_exam(emed_no, country)
+            if not success and self._recover_session(automator):
+                # Run the case again in the fresh session rather than blame it for the broken one
+                success = automator.automate_cxr_exam(emed_no, country)
+            self._finish_item(automator, index, emed_no, attempt, success, automator.last_error, automator.last_case_seconds)
+
+    def _start_item(self, index, emed_no, attempt=0):
+        """Report that processing of an eMedical No. starts and return its country."""
+        with self._callback_lock:
+            self.update_status_callback(f'Processing: {emed_no}' + (f' (retry {attempt})' if attempt else ''))
+            if self.update_emed_no_listbox_callback:
+                self.update_emed_no_listbox_callback(emed_no, index=index, highlight=True)
+        logging.info(f'Processing: {emed_no}' + (f' (retry {attempt})' if attempt else ''))
+
+        if self.journal:
+            self.journal.record(emed_no, CheckpointJournal.IN_PROGRESS)
+
+        country = self._get_country(emed_no)
+        if country == UNKNOWN_COUNTRY:
+            logging.warning(f"Unknown country for eMedical No.: {emed_no}")
+        return country
+
+    def _finish_item(self, automator, index, emed_no, attempt, success, error, seconds=None):
+        """
+        Record the result of an eMedical No., re-queue it after a transient failure, and report it.
+
+        seconds is how long the case ran in the browser, None if it never got that far.
+        """
+        if seconds is not None:
+            self.work_scheduler.finished(self._get_country(emed_no), success, seconds)
+        # Submitted now, or with no 502 exam left to do: either way there is nothing to reopen
+        if success and self.case_index:
+            self.case_index.record(emed_no, CaseStatusIndex.COMPLETED)
+
+        delay = None
+        if not success:
+            kind = RetryScheduler.classify(error)
+            if kind == RetryScheduler.TRANSIENT:
+                delay = self.retry_scheduler.schedule(index, emed_no, attempt + 1)
+            if delay is not None:
+                logging.warning(f"Retrying {emed_no} in {delay:.0f}s after {kind} failure: {error}", extra={"failure": kind})
+            else:
+                logging.warning(f"Failed: {emed_no} ({kind}): {error}", extra={"failure": kind})
+
+        if delay is None:
+            self._record_outcome(emed_no, success)
+        if self.journal:
+            if success:
+                self.journal.record(emed_no, CheckpointJournal.SUCCEEDED)
+            else:
+                self.journal.record(emed_no, CheckpointJournal.PENDING if delay is not None else CheckpointJournal.FAILED, error)
+
+        with self._callback_lock:
+            if success:
+                self.stats["retry_succeeded" if attempt else "first_pass_succeeded"] += 1
+                if automator.already_completed:
+                    self.stats["already_completed"] += 1
+            else:
+                self.stats[kind] += 1
+                if delay is not None:
+                    self.stats["retries"] += 1
+                else:
+                    self.stats["failed"] += 1
+
+            if self.update_emed_no_listbox_callback:
+                self.update_emed_no_listbox_callback(emed_no, index=index, highlight=False)
+
+            # A re-queued number stays pending; it is only reported once it succeeds or runs out of retries
+            if success:
+                if self.update_success_listbox_callback:
+                    self.update_success_listbox_callback(emed_no)
+            elif delay is None:
+                if self.update_failure_listbox_callback:
+                    self.update_failure_listbox_callback(emed_no)
+
+            if self.update_counts_callback:
+                self.update_counts_callback()
+
+    def _record_outcome(self, emed_no, success):
+        """Buffer the final outcome of an eMedical No. for write-back, if enabled."""
+        source = self.sources.get(emed_no)
+        if self.result_writer is not None and source:
+            self.result_writer.record(emed_no, source, success)
+
+    def _write_back(self):
+        """Commit the buffered outcomes to the source workbooks, if write-back is enabled."""
+        if self.result_writer is None or not len(self.result_writer):
+            return
+        written = self.result_writer.commit()
+        with self._callback_lock:
+            self.update_status_callback(f"Wrote {written} results back to the Excel files")
+
+    def _recycle_browser(self, automator):
+        """Relaunch the automator's browser between cases once it has grown too large or slow."""
+        reason = automator.monitor.recycle_reason()
+        if reason is None or stop_event.is_set():
+            return
+        logging.info(f"Recycling browser: {reason}")
+        with self._callback_lock:
+            self.stats["recycles"] += 1
+            self.update_status_callback(f"Recycling browser: {reason}")
+        if not automator.restart():
+            logging.error("Could not log in again after recycling the browser")
+            automator.quit()
+
+    def _recover_session(self, automator):
+        """Restart the automator's browser session if the watchdog finds it broken; True if it was restarted."""
+        reason = automator.check_health()
+        if reason is None or stop_event.is_set():
+            return False
+        logging.warning(f"Restarting browser session: {reason}")
+        with self._callback_lock:
+            self.stats["restarts"] += 1
+            self.update_status_callback(f"Restarting browser session: {reason}")
+        if automator.restart():
+            return True
+        logging.error("Could not restart the browser session")
+        automator.quit()
+        return False
+
+    def _reset_stats(self):
+        """Zero the outcome counts; failure kinds count failed attempts, the rest count eMedical No."""
+        self.stats = {
+            "first_pass_succeeded": 0,
+            "retry_succeeded": 0,
+            "failed": 0,
+            "retries": 0,
+            "already_completed": 0,
+            "restarts": 0,
+            "recycles": 0,
+            RetryScheduler.TRANSIENT: 0,
+            RetryScheduler.PAGE_CHANGED: 0,
+            RetryScheduler.PERMANENT: 0,
+        }
+
+    def _log_stats(self):
+        """Log first-pass and eventual success rates of the last run."""
+        stats = self.stats
+        total = stats["first_pass_succeeded"] + stats["retry_succeeded"] + stats["failed"]
+        if not total:
+            return
+        eventual = stats["first_pass_succeeded"] + stats["retry_succeeded"]
+        logging.info(f"Success rate: {stats['first_pass_succeeded'] / total:.1%} first pass, "
+                     f"{eventual / total:.1%} after {stats['retries']} retries ({total} eMedical No.)")
+        logging.info(f"Failed attempts: {stats[RetryScheduler.TRANSIENT]} transient, "
+                     f"{stats[RetryScheduler.PAGE_CHANGED]} page changed, {stats[RetryScheduler.PERMANENT]} permanent")
+        if stats["already_completed"]:
+            logging.info(f"Already completed on the server: {stats['already_completed']} (not reopened)")
+        if stats["restarts"] or stats["recycles"]:
+            logging.info(f"Browser sessions restarted: {stats['restarts']}, recycled: {stats['recycles']}")
+
+    def start_sharded(self, profiles, excel_path, headless, close_browser, workers=DEFAULT_WORKERS, resume=False,
+                      retries=MAX_RETRIES):
+        """
+        Split the eMedical No. of the workbook(s) across accounts and process each share in its own process.
+
+        profiles is a list of {"name", "user_id", "password"} dicts (see load_profiles).
+        Every process logs in with its account and runs `workers` browsers configured
+        like our automator; results come back through the usual callbacks, so the run
+        is reported as one batch. Returns False if no account could log in.
+        """
+        if not self.update_status_callback:
+            logging.error("GUI update callbacks are not set.")
+            return False
+        if len(profiles) == 1:
+            profile = profiles[0]
+            return self.start_workflow(profile["user_id"], profile["password"], excel_path, headless, close_browser,
+                                       workers, resume, retries)
+
+        emedical_numbers = self._read_numbers(excel_path)
+        if emedical_numbers is None:
+            return False
+        stop_event.clear()
+        self._reset_stats()
+        if self.clear_listboxes_callback:
+            self.clear_listboxes_callback()
+
+        # Deal the numbers round-robin so every account gets the same mix of countries
+        indices = {}
+        shards = [[] for _ in profiles]
+        skipped = 0
+        for emed_no in emedical_numbers:
+            if (resume and self.journal and self.journal.is_completed(emed_no)) or \
+                    (self.case_index and self.case_index.is_completed(emed_no)):
+                skipped += 1
+                continue
+            self.update_emed_no_listbox_callback(emed_no)
+            if self.journal:
+                self.journal.record(emed_no, CheckpointJournal.PENDING)
+            shards[len(indices) % len(shards)].append(emed_no)
+            indices[emed_no] = len(indices)
+        self.update_status_callback(f"Read {len(indices)} eMedical No." + (f" ({skipped} already completed)" if skipped else ""))
+
+        automator = self.web_automator
+        settings = {
+            "base_url": automator.base_url, "wait_settings": automator.waits.settings, "plans": str(automator.plans.path),
+            "lean": automator.lean, "page_load_strategy": automator.page_load_strategy,
+            "pipeline_depth": automator.pipeline_depth, "fast_fill": automator.fast_fill,
+            "scheduling_policy": self.scheduling_policy,
+            "recycle_after": automator.monitor.recycle_after, "headless": headless, "close_browser": close_browser,
+            "workers": workers, "retries": retries,
+        }
+        # Spawn rather than fork: each shard starts clean instead of inheriting our threads and browsers
+        context = multiprocessing.get_context("spawn")
+        events = context.Queue()
+        stop = context.Event()
+        # Shard processes log through us, so the log file has a single writer
+        with child_logging(context) as log_queue:
+            running = {}
+            for profile, numbers in zip(profiles, shards):
+                if not numbers:
+                    continue
+                process = context.Process(
+                    target=_run_shard,
+                    args=(profile["name"], profile["user_id"], profile["password"], numbers, settings, events, stop,
+                          log_queue),
+                    name=f"shard-{profile['name']}",
+                    daemon=True
+                )
+                process.start()
+                running[profile["name"]] = (process, numbers)
+            logging.info(f"Started {len(running)} shards of about {len(indices) // max(1, len(running))} eMedical No. each")
+
+            reported = set()
+            logged_in = 0
+            while running:
+                if stop_event.is_set():
+                    stop.set()
+                # Checked before waiting: a shard that was already dead has flushed all its events by the time get() times out
+                exited = [name for name, (process, _) in running.items() if not process.is_alive()]
+                try:
+                    event = events.get(timeout=0.5)
+                except queue.Empty:
+                    for name in exited:
+                        process, numbers = running.pop(name)
+                        logging.error(f"Shard {name} exited with code {process.exitcode} before finishing")
+                        self._fail_unreported(numbers, reported)
+                    continue
+
+                kind, name = event[0], event[1]
+                if kind == "done":
+                    process, numbers = running.pop(name)
+                    process.join()
+                    for key, value in event[3].items():
+                        self.stats[key] = self.stats.get(key, 0) + value
+                    if event[2]:
+                        logged_in += 1
+                        logging.info(f"Shard {name} finished")
+                    elif not stop_event.is_set():
+                        logging.error(f"Shard {name} could not log in")
+                        self._fail_unreported(numbers, reported)
+                    continue
+                with self._callback_lock:
+                    if kind == "status":
+                        self.update_status_callback(f"[{name}] {event[2]}")
+                    elif kind == "highlight":
+                        if self.update_emed_no_listbox_callback:
+                            self.update_emed_no_listbox_callback(event[2], index=indices.get(event[2]), highlight=event[3])
+                    elif kind == "result":
+                        self._report_shard_result(event[2], event[3])
+                        reported.add(event[2])
+
+        if self.case_index:
+            self.case_index.save()
+        self._write_back()
+
+        if not logged_in:
+            self.update_status_callback("Login failed, please check your credentials")
+            return False
+
+        self._log_stats()
+        if stop_event.is_set():
+            self.update_status_callback("Processing stopped by user")
+        if self.update_counts_callback:
+            self.update_counts_callback()
+        self.update_status_callback("Processing complete!")
+        logging.info("Processing complete!")
+        return True
+
+    def _report_shard_result(self, emed_no, success):
+        """Record and report the final result a shard sent for an eMedical No.; call with the callback lock held."""
+        self._record_outcome(emed_no, success)
+        if self.journal:
+            self.journal.record(emed_no, CheckpointJournal.SUCCEEDED if success else CheckpointJournal.FAILED)
+        if success and self.case_index:
+            self.case_index.record(emed_no, CaseStatusIndex.COMPLETED)
+        if success:
+            if self.update_success_listbox_callback:
+                self.update_success_listbox_callback(emed_no)
+        elif self.update_failure_listbox_callback:
+            self.update_failure_listbox_callback(emed_no)
+        if self.update_counts_callback:
+            self.update_counts_callback()
+
+    def _fail_unreported(self, numbers, reported):
+        """Report every number of a crashed shard that has no result yet as failed."""
+        with self._callback_lock:
+            for emed_no in numbers:
+                if emed_no not in reported:
+                    self.stats["failed"] += 1
+                    self._report_shard_result(emed_no, False)
+
+    def stop_workflow(self):
+        """Trigger the stop event to halt the processing."""
+        stop_event.set()
+
+    def _get_country(self, emed_no):
+        """Determine the country based on the eMedical No. prefix."""
+        return self.web_automator.plans.country_of(emed_no)
+
+
+def load_profiles(path):
+    """
+    Read account profiles for start_sharded from a JSON list of {"user_id", "password", "name"} objects.
+
+    "name" defaults to the user id and labels the account's status messages.
+    """
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    if not isinstance(data, list) or not data:
+        raise ValueError(f"{path}: expected a non-empty list of profiles")
+    profiles = []
+    for number, entry in enumerate(data, start=1):
+        if not isinstance(entry, dict) or not entry.get("user_id") or not entry.get("password"):
+            raise ValueError(f"{path}: profile {number} needs a user_id and a password")
+        profile = {"name": str(entry.get("name") or entry["user_id"]), "user_id": entry["user_id"],
+                   "password": entry["password"]}
+        if any(p["name"] == profile["name"] for p in profiles):
+            raise ValueError(f"{path}: duplicate profile name {profile['name']}")
+        profiles.append(profile)
+    return profiles
+
+
+def _run_shard(name, user_id, password, numbers, settings, events, stop, log_queue):
+    """Process entry point of one account's shard: work through `numbers`, reporting to the parent over `events`."""
+    forward_logging(log_queue)
+    # Ctrl-C reaches the whole process group; the parent decides when to stop via `stop`
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    def forward_stop():
+        stop.wait()
+        stop_event.set()
+    threading.Thread(target=forward_stop, name="stop-watcher", daemon=True).start()
+
+    automator = EmedicalWebAutomator(settings["base_url"], settings["wait_settings"], plans=FormPlans(settings["plans"]))
+    automator.configure_browser(settings["lean"], settings["page_load_strategy"], settings["pipeline_depth"])
+    automator.fast_fill = settings["fast_fill"]
+    automator.monitor.recycle_after = settings["recycle_after"]
+
+    def update_emed_no_listbox(emed_no, index=None, highlight=False):
+        # The parent listed every number already; only forward which ones are being worked on
+        if index is not None:
+            events.put(("highlight", name, emed_no, highlight))
+
+    # The parent keeps the journal and case status index, from the results sent here
+    manager = EmedicalWorkflowManager(ExcelProcessor(), automator)
+    manager.scheduling_policy = settings["scheduling_policy"]
+    manager.set_gui_callbacks(
+        update_status=lambda msg: events.put(("status", name, msg)),
+        update_emed_no_listbox=update_emed_no_listbox,
+        update_success_listbox=lambda emed_no: events.put(("result", name, emed_no, True)),
+        update_failure_listbox=lambda emed_no: events.put(("result", name, emed_no, False)),
+        update_counts=lambda: None,
+        clear_listboxes=lambda: None
+    )
+    processed = False
+    try:
+        processed = manager.process_numbers(user_id, password, iter(numbers), settings["headless"],
+                                            settings["close_browser"], settings["workers"], retries=settings["retries"])
+    finally:
+        events.put(("done", name, processed, manager.stats))
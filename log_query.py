@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@author: Hsin-ming Chen
+@license: MIT
+@file: log_query.py
+@time: 2025/08/16
+@contact: hsinming.chen@gmail.com
+@software: PyCharm
+
+Filter the JSON-lines log (log.jsonl and its rotated .gz files) by case, failure type, level or time.
+
+    python log_query.py --emed-no HAP123456
+    python log_query.py --failure page_changed --since 2025-08-01 --json
+
+Rotated files last written before --since are skipped without being opened, and
+lines are only parsed once a plain-text pre-check says they can match, so
+months of history stay quick to search.
+"""
+import argparse
+import gzip
+import json
+import re
+import sys
+from collections import deque
+from datetime import datetime
+from pathlib import Path
+
+from log_setup import log_file, LOG_FIELDS
+
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+
+def log_files(path, since=None):
+    """Return the current log and its rotated files, oldest first, leaving out those last written before since."""
+    path = Path(path)
+    # log.jsonl, and its rotations log.jsonl.1.gz, log.jsonl.2.gz, ... (the higher, the older)
+    pattern = re.compile(re.escape(path.name) + r"(?:\.(\d+))?(?:\.gz)?$")
+    logs = []
+    for p in path.parent.glob(path.name + "*"):
+        match = pattern.match(p.name)
+        if match and p.is_file():
+            logs.append((int(match.group(1) or 0), p))
+    files = [p for _, p in sorted(logs, key=lambda item: item[0], reverse=True)]
+    if since is not None:
+        files = [p for p in files if datetime.fromtimestamp(p.stat().st_mtime) >= since]
+    return files
+
+
+def read_lines(path):
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(path, 'rt', encoding='utf-8', errors='replace') as f:
+        yield from f
+
+
+def matches(entry, args):
+    if args.emed_no and entry.get("emed_no") != args.emed_no:
+        return False
+    if args.failure and entry.get("failure") != args.failure:
+        return False
+    if args.country and entry.get("country") != args.country:
+        return False
+    if args.step and entry.get("step") != args.step:
+        return False
+    if args.level and LEVELS.index(entry.get("level", "DEBUG")) < LEVELS.index(args.level):
+        return False
+    if args.grep and args.grep not in entry.get("message", ""):
+        return False
+    # ISO timestamps compare correctly as strings
+    if args.since and entry.get("time", "") < args.since.isoformat():
+        return False
+    if args.until and entry.get("time", "") >= args.until.isoformat():
+        return False
+    return True
+
+
+def query(args):
+    """Yield the matching log entries, oldest first."""
+    # Substrings a matching line must contain, checked before paying for json.loads
+    needles = [json.dumps(value, ensure_ascii=False) for value in (args.emed_no, args.failure, args.country, args.step)
+               if value]
+    for path in log_files(args.log, args.since):
+        for line in read_lines(path):
+            if any(needle not in line for needle in needles):
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                continue
+            if matches(entry, args):
+                yield entry
+
+
+def format_entry(entry):
+    fields = " ".join(f"{field}={entry[field]}" for field in LOG_FIELDS if field in entry)
+    return f"{entry.get('time')} {entry.get('level', ''):<7} {entry.get('worker', '')} {entry.get('message', '')}" + \
+        (f"  [{fields}]" if fields else "")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Filter the eMedical automation's JSON-lines log.")
+    parser.add_argument("--log", default=str(log_file), help=f"current log file (default: {log_file})")
+    parser.add_argument("--emed-no", help="only records of this eMedical No.")
+    parser.add_argument("--failure", help="only failures of this kind (transient, page_changed, permanent)")
+    parser.add_argument("--country", help="only records of this country")
+    parser.add_argument("--step", help="only records of this step, e.g. case or submit (steps need EMEDICAL_LOG_LEVEL=DEBUG)")
+    parser.add_argument("--level", type=str.upper, choices=LEVELS, help="only records at this level or above")
+    parser.add_argument("--grep", help="only records whose message contains this text")
+    parser.add_argument("--since", type=datetime.fromisoformat, help="ISO date or time, e.g. 2025-08-01")
+    parser.add_argument("--until", type=datetime.fromisoformat, help="ISO date or time, exclusive")
+    parser.add_argument("--limit", type=int, help="show only the last N matches")
+    parser.add_argument("--json", action="store_true", help="print matching records as JSON lines")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    entries = query(args)
+    if args.limit:
+        entries = deque(entries, maxlen=args.limit)
+    count = 0
+    for entry in entries:
+        count += 1
+        print(json.dumps(entry, ensure_ascii=False) if args.json else format_entry(entry))
+    if not args.json:
+        print(f"{count} matching records", file=sys.stderr)
+    return 0 if count else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding:utf-8 -*-
+"""
+@author: Hsin-ming Chen
+@license: MIT
+@file: log_setup.py
+@time: 2025/08/16
+@contact: hsinming.chen@gmail.com
+@software: PyCharm
+
+Logging shared by the automation and log_query.py. It only uses the standard
+library and has no side effects on import; emedical.py calls configure_logging().
+"""
+import atexit
+import gzip
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import shutil
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from pathlib import Path
+
+# JSON lines, rotated at LOG_MAX_BYTES into LOG_BACKUPS gzipped files (log.jsonl.1.gz is the newest);
+# see log_query.py. EMEDICAL_LOG_LEVEL=DEBUG also logs every step of every case.
+log_file = Path("log.jsonl")
+LOG_MAX_BYTES = 10 * 1024 * 1024
+LOG_BACKUPS = 200
+LOG_LEVEL = os.environ.get("EMEDICAL_LOG_LEVEL", "INFO").upper()
+# Record attributes written as JSON fields when set, via `extra` or log_context()
+LOG_FIELDS = ("emed_no", "country", "step", "duration", "failure")
+
+_log_context = threading.local()
+
+
+@contextmanager
+def log_context(**fields):
+    """Add fields (e.g. emed_no, country) to every record logged by this thread inside the block."""
+    previous = getattr(_log_context, "fields", {})
+    _log_context.fields = {**previous, **fields}
+    try:
+        yield
+    finally:
+        _log_context.fields = previous
+
+
+class _ContextFilter(logging.Filter):
+    """Copies the emitting thread's log_context() onto its records, before they leave the thread."""
+    def filter(self, record):
+        for key, value in getattr(_log_context, "fields", {}).items():
+            if not hasattr(record, key):
+                setattr(record, key, value)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per record: time, level, worker (process/thread), message and any LOG_FIELDS."""
+    def format(self, record):
+        entry = {
+            "time": datetime.fromtimestamp(record.created).isoformat(timespec='milliseconds'),
+            "level": record.levelname,
+            "worker": f"{record.processName}/{record.threadName}",
+            "message": record.getMessage(),
+        }
+        for field in LOG_FIELDS:
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False)
+
+
+def _gzip_rotator(source, dest):
+    with open(source, 'rb') as f_in, gzip.open(dest, 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+    os.remove(source)
+
+
+def _set_root_handler(handler):
+    root = logging.getLogger()
+    for old in root.handlers[:]:
+        root.removeHandler(old)
+    handler.addFilter(_ContextFilter())
+    root.addHandler(handler)
+    root.setLevel(LOG_LEVEL)
+
+
+def configure_logging():
+    """
+    Route logging through a queue to a background thread that writes the console and the
+    rotating JSON log, so the automation threads never wait on disk or terminal I/O.
+    Child processes only get the console until forward_logging() connects them to the parent.
+    """
+    console = logging.StreamHandler()
+    console.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+    if multiprocessing.parent_process() is not None:
+        _set_root_handler(console)
+        return
+
+    file_handler = RotatingFileHandler(log_file, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUPS, encoding='utf-8')
+    file_handler.setFormatter(JsonFormatter())
+    file_handler.namer = lambda name: name + ".gz"
+    file_handler.rotator = _gzip_rotator
+    log_queue = queue.SimpleQueue()
+    listener = QueueListener(log_queue, console, file_handler)
+    listener.start()
+    # Flush what is still queued when the program exits
+    atexit.register(listener.stop)
+    _set_root_handler(QueueHandler(log_queue))
+
+
+def forward_logging(log_queue):
+    """In a child process, send every log record to the parent through log_queue (see child_logging())."""
+    _set_root_handler(QueueHandler(log_queue))
+
+
+class _ReemitHandler(logging.Handler):
+    def handle(self, record):
+        logging.getLogger(record.name).handle(record)
+        return True
+
+
+@contextmanager
+def child_logging(context):
+    """Yield a queue for child processes to pass to forward_logging(); their records are logged here meanwhile."""
+    log_queue = context.Queue()
+    listener = QueueListener(log_queue, _ReemitHandler())
+    listener.start()
+    try:
+        yield log_queue
+    finally:
+        listener.stop()
@@ -0,0 +1,9 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+# emedical opens log.jsonl in the working directory when it is imported; keep it out of the repository
+os.chdir(tempfile.mkdtemp(prefix="emedical-tests-"))
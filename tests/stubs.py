@@ -0,0 +1,87 @@
+"""Stand-ins for the browser, so the workflow can be tested without Chrome."""
+from selenium.common.exceptions import TimeoutException, WebDriverException
+
+from emedical import CheckpointJournal, EmedicalWebAutomator, EmedicalWorkflowManager, ExcelProcessor
+
+
+class StubAutomator(EmedicalWebAutomator):
+    """Succeeds every case, except that its browser dies after `lives` cases and `flaky` numbers time out once."""
+    def __init__(self, lives=None, flaky=()):
+        super().__init__("http://stub")
+        self.lives = lives
+        self.flaky = set(flaky)
+        self.running = False
+        self.processed = []
+
+    def spawn(self):
+        return StubAutomator(self.lives, self.flaky)
+
+    def login(self, user_id, password, headless=False):
+        self.running = True
+        return True
+
+    @property
+    def is_running(self):
+        return self.running
+
+    def automate_cxr_exam(self, emed_no, country):
+        self.already_completed = False
+        self.last_case_seconds = 0.01
+        if self.lives is not None and len(self.processed) >= self.lives:
+            self.running = False
+            self.last_error = WebDriverException("chrome not reachable")
+            return False
+        self.processed.append(emed_no)
+        if emed_no in self.flaky:
+            self.flaky.discard(emed_no)
+            self.last_error = TimeoutException("Timed out waiting for text")
+            return False
+        self.last_error = None
+        return True
+
+    def check_health(self):
+        return None if self.running else "browser is not running"
+
+    def restart(self):
+        return False
+
+    def quit(self):
+        self.running = False
+
+
+class Results:
+    def __init__(self, manager):
+        self.succeeded = []
+        self.failed = []
+        manager.set_gui_callbacks(
+            update_status=lambda msg: None,
+            update_emed_no_listbox=lambda emed_no, index=None, highlight=False: None,
+            update_success_listbox=self.succeeded.append,
+            update_failure_listbox=self.failed.append,
+            update_counts=lambda: None,
+            clear_listboxes=lambda: None,
+        )
+
+
+def run(tmp_path, automator, numbers, workers=1, retries=0):
+    journal = CheckpointJournal(tmp_path / "journal.jsonl")
+    manager = EmedicalWorkflowManager(ExcelProcessor(), automator, journal)
+    results = Results(manager)
+    processed = manager.process_numbers("user", "password", iter(numbers), headless=True, close_browser=True,
+                                        workers=workers, retries=retries)
+    journal.close()
+    return processed, results, manager, CheckpointJournal(tmp_path / "journal.jsonl")
+
+
+
+class FakeDriver:
+    def __init__(self, result):
+        self.result = result
+        self.args = None
+
+    def execute_script(self, script, *args):
+        self.args = args
+        return self.result
+
+    def unwrap(self):
+        return self
@@ -0,0 +1,46 @@
+import logging
+import zipfile
+
+from emedical import ExcelProcessor
+from tests.workbooks import write_rows
+
+
+def _numbers(path):
+    return [(emed_no, row) for emed_no, _, row in ExcelProcessor().iter_entries(path)]
+
+
+def test_numbers_after_a_long_gap_are_read(tmp_path):
+    path = tmp_path / "gap.xlsx"
+    write_rows(path, [["eMedical No."], ["HAP1"]] + [None] * 500 + [["HAP2"]])
+    assert _numbers(path) == [("HAP1", 2), ("HAP2", 503)]
+
+
+def test_every_header_column_is_read(tmp_path):
+    path = tmp_path / "tables.xlsx"
+    write_rows(path, [
+        ["Batch 1"],
+        ["eMedical No.", None, "eMedical No."],
+        ["HAP1", None, "HAP2"],
+        [None, None, "HAP3"],
+        [None, "eMedical No."],
+        ["HAP4", "HAP5", "eMedical No."],
+    ])
+    assert _numbers(path) == [("HAP1", 3), ("HAP2", 3), ("HAP3", 4), ("HAP4", 6), ("HAP5", 6)]
+
+
+def test_rows_past_the_recorded_dimension_are_skipped_with_a_warning(tmp_path, caplog):
+    path = tmp_path / "stale.xlsx"
+    write_rows(path, [["eMedical No."], ["HAP1"], ["HAP2"], ["HAP3"]])
+    # Some exporters record a dimension smaller than the data they write
+    with zipfile.ZipFile(path) as source:
+        parts = {name: source.read(name) for name in source.namelist()}
+    sheet = "xl/worksheets/sheet1.xml"
+    assert b'<dimension ref="A1:A4" />' in parts[sheet]
+    parts[sheet] = parts[sheet].replace(b'<dimension ref="A1:A4" />', b'<dimension ref="A1:A2" />')
+    with zipfile.ZipFile(path, "w") as target:
+        for name, data in parts.items():
+            target.writestr(name, data)
+
+    with caplog.at_level(logging.WARNING):
+        assert _numbers(path) == [("HAP1", 2)]
+    assert "Skipped 2 eMedical No. in sheet Cases below row 2" in caplog.text
@@ -0,0 +1,36 @@
+import threading
+
+from emedical import ExcelProcessor, FolderWatcher
+from tests.workbooks import write_workbook
+
+
+def test_poll_waits_for_a_file_to_settle(tmp_path):
+    watcher = FolderWatcher(tmp_path, ExcelProcessor(), debounce=0)
+    write_workbook(tmp_path / "a.xlsx", ["HAP1"])
+    (tmp_path / "~$a.xlsx").write_bytes(b"")
+    # Noticed first, read once it is seen unchanged again
+    assert watcher.poll() == []
+    assert watcher.poll() == [tmp_path / "a.xlsx"]
+    assert watcher.poll() == []
+
+
+def test_yields_only_new_numbers(tmp_path):
+    stop = threading.Event()
+    files = []
+
+    def on_file(path, new):
+        files.append((path.name, new))
+        if len(files) == 2:
+            stop.set()
+
+    watcher = FolderWatcher(tmp_path, ExcelProcessor(), interval=0, debounce=0, full_scan=0, on_file=on_file, stop=stop)
+    write_workbook(tmp_path / "a.xlsx", ["HAP1", "HAP2"])
+    numbers = []
+    for emed_no in watcher:
+        numbers.append(emed_no)
+        if emed_no == "HAP2":
+            # A re-export with one number added
+            write_workbook(tmp_path / "b.xlsx", ["HAP2", "HAP3"])
+    assert numbers == ["HAP1", "HAP2", "HAP3"]
+    assert files == [("a.xlsx", 2), ("b.xlsx", 1)]
+    assert watcher.sources["HAP3"] == (str(tmp_path / "b.xlsx"), "Cases", 3)
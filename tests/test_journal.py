@@ -0,0 +1,56 @@
+from emedical import CheckpointJournal
+
+
+def test_resume_from_latest_state(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = CheckpointJournal(path)
+    journal.record("HAP1", CheckpointJournal.IN_PROGRESS)
+    journal.record("HAP1", CheckpointJournal.SUCCEEDED)
+    journal.record("HAP2", CheckpointJournal.FAILED, "Timed out")
+    journal.record("HAP3", CheckpointJournal.IN_PROGRESS)
+    journal.close()
+
+    journal = CheckpointJournal(path)
+    assert journal.is_completed("HAP1")
+    assert not journal.is_completed("HAP2")
+    assert journal.state("HAP2") == CheckpointJournal.FAILED
+    # Interrupted mid-case: processed again on resume
+    assert journal.state("HAP3") == CheckpointJournal.IN_PROGRESS
+    assert journal.state("HAP4") is None
+    journal.close()
+
+
+def test_torn_last_line_is_skipped(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = CheckpointJournal(path)
+    journal.record("HAP1", CheckpointJournal.SUCCEEDED)
+    journal.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"emed_no": "HAP2", "sta')
+
+    journal = CheckpointJournal(path)
+    assert journal.is_completed("HAP1")
+    assert journal.state("HAP2") is None
+    journal.close()
+
+
+def test_mostly_superseded_journal_is_compacted(tmp_path):
+    path = tmp_path / "journal.jsonl"
+    journal = CheckpointJournal(path)
+    for attempt in range(600):
+        for emed_no in ("HAP1", "HAP2"):
+            journal.record(emed_no, CheckpointJournal.IN_PROGRESS if attempt < 599 else CheckpointJournal.SUCCEEDED)
+    journal.close()
+
+    journal = CheckpointJournal(path)
+    journal.close()
+    assert len(path.read_text(encoding="utf-8").splitlines()) == 2
+    assert CheckpointJournal(path).is_completed("HAP2")
+
+
+def test_record_after_close_is_ignored(tmp_path):
+    journal = CheckpointJournal(tmp_path / "journal.jsonl")
+    journal.record("HAP1", CheckpointJournal.SUCCEEDED)
+    journal.close()
+    journal.record("HAP2", CheckpointJournal.FAILED)
+    assert CheckpointJournal(tmp_path / "journal.jsonl").state("HAP2") is None
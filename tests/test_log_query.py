@@ -0,0 +1,64 @@
+import gzip
+import json
+import os
+from datetime import datetime
+
+import log_query
+
+
+def entry(time, message, **fields):
+    # Written like JsonFormatter does, non-ASCII text unescaped
+    return json.dumps(dict(time=time, level=fields.pop("level", "INFO"), worker="MainProcess/worker-1", message=message,
+                           **fields), ensure_ascii=False) + "\n"
+
+
+def write_logs(tmp_path):
+    log = tmp_path / "log.jsonl"
+    old = tmp_path / "log.jsonl.2.gz"
+    with gzip.open(old, "wt", encoding="utf-8") as f:
+        f.write(entry("2025-07-01T10:00:00.000", "Failed: HAP1", level="WARNING", emed_no="HAP1", failure="transient"))
+    newer = tmp_path / "log.jsonl.1.gz"
+    with gzip.open(newer, "wt", encoding="utf-8") as f:
+        f.write(entry("2025-08-02T10:00:00.000", "Processing: HAP1", emed_no="HAP1"))
+        f.write("not json\n")
+    log.write_text(entry("2025-08-03T10:00:00.000", "Failed: HAP2", level="WARNING", emed_no="HAP2",
+                         failure="page_changed", country="加拿大")
+                   + entry("2025-08-03T10:00:01.000", "Processing complete!"), encoding="utf-8")
+    os.utime(old, (datetime(2025, 7, 1, 10).timestamp(),) * 2)
+    os.utime(newer, (datetime(2025, 8, 2, 10).timestamp(),) * 2)
+    return log
+
+
+def run(log, *argv):
+    return [e["message"] for e in log_query.query(log_query.parse_args(["--log", str(log), *argv]))]
+
+
+def test_files_oldest_first_and_skipped_by_mtime(tmp_path):
+    log = write_logs(tmp_path)
+    assert [p.name for p in log_query.log_files(log)] == ["log.jsonl.2.gz", "log.jsonl.1.gz", "log.jsonl"]
+    assert [p.name for p in log_query.log_files(log, datetime(2025, 8, 1))] == ["log.jsonl.1.gz", "log.jsonl"]
+
+
+def test_files_not_named_like_rotations_are_left_out(tmp_path):
+    log = write_logs(tmp_path)
+    for name in ("log.jsonl.old.gz", "log.jsonl.tmp", "log.jsonl.10.gz.bak", "log.jsonl2"):
+        (tmp_path / name).write_text("")
+    (tmp_path / "log.jsonl.10.gz").write_bytes(gzip.compress(b""))
+    assert [p.name for p in log_query.log_files(log)] == ["log.jsonl.10.gz", "log.jsonl.2.gz", "log.jsonl.1.gz", "log.jsonl"]
+
+
+def test_filters(tmp_path):
+    log = write_logs(tmp_path)
+    assert run(log, "--emed-no", "HAP1") == ["Failed: HAP1", "Processing: HAP1"]
+    assert run(log, "--failure", "page_changed") == ["Failed: HAP2"]
+    assert run(log, "--country", "加拿大") == ["Failed: HAP2"]
+    assert run(log, "--level", "warning") == ["Failed: HAP1", "Failed: HAP2"]
+    assert run(log, "--grep", "complete") == ["Processing complete!"]
+    assert run(log, "--since", "2025-08-01", "--until", "2025-08-03") == ["Processing: HAP1"]
+
+
+def test_main_exit_code(tmp_path, capsys):
+    log = write_logs(tmp_path)
+    assert log_query.main(["--log", str(log), "--limit", "1", "--json"]) == 0
+    assert json.loads(capsys.readouterr().out)["message"] == "Processing complete!"
+    assert log_query.main(["--log", str(log), "--emed-no", "HAP9"]) == 1
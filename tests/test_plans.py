@@ -0,0 +1,57 @@
+import copy
+import json
+
+import pytest
+
+from emedical import UNKNOWN_COUNTRY, FormPlans, plans_file
+
+with open(plans_file, encoding="utf-8") as f:
+    PLANS = json.load(f)
+
+
+def load(tmp_path, change=None):
+    data = copy.deepcopy(PLANS)
+    if change:
+        change(data)
+    path = tmp_path / "plans.json"
+    path.write_text(json.dumps(data), encoding="utf-8")
+    return FormPlans(path)
+
+
+def test_shipped_plans(tmp_path):
+    plans = load(tmp_path)
+    assert plans.country_of("HAP123") == "澳大利亞"
+    assert plans.country_of("NZHR123") == "紐西蘭"
+    assert plans.country_of("CEAC1") == "美國"
+    assert plans.country_of("XYZ1") == UNKNOWN_COUNTRY
+    assert plans.plan_for("加拿大")
+
+
+def test_longest_prefix_wins(tmp_path):
+    plans = load(tmp_path, lambda d: d["countries"].update({"測試": {"prefixes": ["HAPX"], "plan": "declaration"}}))
+    assert plans.country_of("HAPX1") == "測試"
+    assert plans.country_of("HAP1") == "澳大利亞"
+
+
+@pytest.mark.parametrize("change, message", [
+    (lambda d: d["plans"]["close"][0]["steps"].__setitem__(0, {"click": ["next"]}), "unknown field"),
+    (lambda d: d["plans"]["close"][0]["steps"].__setitem__(0, {"click": "nope"}), "unknown field"),
+    (lambda d: d["countries"]["美國"].__setitem__("prefixes", "ABC"), "prefixes"),
+    (lambda d: d["countries"]["美國"].__setitem__("prefixes", [""]), "prefixes"),
+    (lambda d: d["countries"]["美國"].__setitem__("prefixes", ["HAP"]), "listed for both"),
+    (lambda d: d["countries"]["美國"].__setitem__("plan", ["declaration"]), "unknown plan"),
+    (lambda d: d["plans"]["close"].append({"include": {"a": 1}}), "unknown plan"),
+    (lambda d: d["plans"]["close"].append({"include": "grading"}), "includes itself"),
+    (lambda d: d["plans"]["close"].append({"fill": [["normal"]]}), "fill takes"),
+    (lambda d: d["plans"]["close"].append({"fill": []}), "fill takes"),
+    (lambda d: d["plans"]["close"].append({"span": ["x"], "steps": []}), "unknown trace step"),
+    (lambda d: d["plans"]["close"].append({"span": "search"}), "needs 'steps'"),
+    (lambda d: d["plans"]["close"].append({"write": "case_id", "text": 5}), "text must be a string"),
+    (lambda d: d["plans"]["close"].append({"write": "case_id", "text": "{name}"}), "only use {emed_no}"),
+    (lambda d: d["plans"]["close"].append({"page": ""}), "marker text"),
+    (lambda d: d["plans"]["close"].append({"click": "close", "extra": 1}), "unknown key"),
+    (lambda d: d["plans"]["close"].append({"click": "close", "select": "close"}), "exactly one"),
+])
+def test_invalid_plans_raise_value_error(tmp_path, change, message):
+    with pytest.raises(ValueError, match=message):
+        load(tmp_path, change)
@@ -0,0 +1,86 @@
+import threading
+
+import pytest
+from selenium.common.exceptions import ElementClickInterceptedException, NoSuchElementException, TimeoutException
+
+from emedical import CaseMismatch, RetryScheduler
+from tests.stubs import FakeDriver, StubAutomator
+
+
+def test_classify():
+    assert RetryScheduler.classify(TimeoutException()) == RetryScheduler.TRANSIENT
+    assert RetryScheduler.classify(CaseMismatch()) == RetryScheduler.TRANSIENT
+    assert RetryScheduler.classify(NoSuchElementException()) == RetryScheduler.PAGE_CHANGED
+    assert RetryScheduler.classify("Unknown country") == RetryScheduler.PERMANENT
+
+
+def test_backoff_is_exponential_and_capped():
+    scheduler = RetryScheduler(max_retries=5, base_delay=2, max_delay=10)
+    assert [scheduler.backoff(attempt) for attempt in range(1, 6)] == [2, 4, 8, 10, 10]
+
+
+def test_schedule_stops_after_max_retries():
+    scheduler = RetryScheduler(max_retries=2, base_delay=0, max_delay=0)
+    assert scheduler.schedule(0, "HAP1", 1) == 0
+    assert scheduler.schedule(0, "HAP1", 2) == 0
+    assert scheduler.schedule(0, "HAP1", 3) is None
+
+
+def test_next_retry_hands_out_due_retries_then_releases():
+    scheduler = RetryScheduler(base_delay=0, max_delay=0)
+    scheduler.acquire()
+    scheduler.schedule(3, "HAP3", 1)
+    assert scheduler.next_retry() == (3, "HAP3", 1)
+    # Nothing pending and no other worker busy
+    assert scheduler.next_retry() is None
+
+
+def test_next_retry_waits_for_busy_workers():
+    scheduler = RetryScheduler(base_delay=0, max_delay=0)
+    scheduler.acquire()
+    scheduler.acquire()
+    result = []
+    waiter = threading.Thread(target=lambda: result.append(scheduler.next_retry()))
+    waiter.start()
+    # The other worker is still busy and may schedule a retry
+    scheduler.schedule(1, "HAP1", 1)
+    waiter.join(5)
+    assert result == [(1, "HAP1", 1)]
+
+
+def test_drain_returns_waiting_retries_and_closes():
+    scheduler = RetryScheduler(base_delay=60, max_delay=60)
+    scheduler.schedule(1, "HAP1", 1)
+    scheduler.schedule(2, "HAP2", 2)
+    assert scheduler.drain() == [(1, "HAP1", 1), (2, "HAP2", 2)]
+    assert scheduler.schedule(3, "HAP3", 1) is None
+    assert scheduler.drain() == []
+
+
+class Covered:
+    def click(self):
+        raise ElementClickInterceptedException("covered by an overlay")
+
+
+def _registry(monkeypatch, element):
+    automator = StubAutomator()
+    automator.waits.settings["clickable"] = (0.05, 0.01)
+    monkeypatch.setattr(automator.api_impl, "require_driver", lambda: FakeDriver(None))
+    monkeypatch.setattr(automator.locators, "find", lambda name: element)
+    return automator.locators
+
+
+def test_missing_field_is_classified_as_page_changed(monkeypatch):
+    locators = _registry(monkeypatch, None)
+    for action in (lambda: locators.click("next"), lambda: locators.wait_for("next"),
+                   lambda: locators.write("id", "HAP1")):
+        with pytest.raises(NoSuchElementException) as e:
+            action()
+        assert RetryScheduler.classify(e.value) == RetryScheduler.PAGE_CHANGED
+
+
+def test_covered_field_is_classified_as_transient(monkeypatch):
+    locators = _registry(monkeypatch, Covered())
+    with pytest.raises(TimeoutException) as e:
+        locators.click("next")
+    assert RetryScheduler.classify(e.value) == RetryScheduler.TRANSIENT
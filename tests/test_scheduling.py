@@ -0,0 +1,58 @@
+import queue
+
+import pytest
+
+from emedical import WorkScheduler
+
+
+def _drain(scheduler):
+    items = []
+    while True:
+        item = scheduler.get()
+        if item is None:
+            return items
+        items.append(item[1])
+
+
+def _scheduler(policy, numbers):
+    scheduler = WorkScheduler(policy, country_of=lambda emed_no: emed_no[:2])
+    for index, emed_no in enumerate(numbers):
+        scheduler.put((index, emed_no))
+    scheduler.put(None)
+    return scheduler
+
+
+NUMBERS = ["AU1", "US1", "AU2", "CA1", "US2", "AU3"]
+
+
+def test_fifo_follows_arrival_order():
+    scheduler = _scheduler("fifo", NUMBERS)
+    assert _drain(scheduler) == NUMBERS
+    assert scheduler.switches == 5
+
+
+def test_grouped_starts_on_largest_group_and_stays_on_it():
+    scheduler = _scheduler("grouped", NUMBERS)
+    assert _drain(scheduler) == ["AU1", "AU2", "AU3", "US1", "US2", "CA1"]
+    assert scheduler.switches == 2
+
+
+def test_shortest_takes_quickest_country_first():
+    scheduler = _scheduler("shortest", NUMBERS)
+    scheduler.finished("AU", True, 30.0)
+    scheduler.finished("US", True, 10.0)
+    # CA was never timed, so it counts as quickest and is measured first
+    assert _drain(scheduler) == ["CA1", "US1", "US2", "AU1", "AU2", "AU3"]
+
+
+def test_get_without_blocking():
+    scheduler = WorkScheduler()
+    with pytest.raises(queue.Empty):
+        scheduler.get(block=False)
+    scheduler.put(None)
+    assert scheduler.get(block=False) is None
+
+
+def test_unknown_policy():
+    with pytest.raises(ValueError):
+        WorkScheduler("random")
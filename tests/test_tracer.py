@@ -0,0 +1,12 @@
+from emedical import Tracer
+
+
+def test_summary_uses_nearest_rank_percentiles():
+    tracer = Tracer()
+    for seconds in range(1, 21):
+        tracer.spans.append(("search", f"HAP{seconds}", "worker", 0.0, float(seconds), "ok"))
+    tracer.spans.append(("login", None, "worker", 0.0, 5.0, "ok"))
+    summary = tracer.summary()
+    assert list(summary) == ["login", "search"]
+    assert summary["search"] == (20, 10.0, 19.0, 20.0)
+    assert summary["login"] == (1, 5.0, 5.0, 5.0)
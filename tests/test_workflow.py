@@ -0,0 +1,77 @@
+"""EmedicalWorkflowManager driven by a stub automator, so no browser is needed."""
+import pytest
+
+import emedical
+from emedical import CaseAlreadyCompleted, CaseMismatch, CheckpointJournal
+from tests.stubs import FakeDriver, StubAutomator, run
+
+
+NUMBERS = [f"HAP{i:04d}" for i in range(10)]
+
+
+@pytest.fixture(autouse=True)
+def no_retry_delay(monkeypatch):
+    monkeypatch.setattr(emedical.RetryScheduler, "backoff", lambda self, attempt: 0)
+
+
+def test_all_succeed(tmp_path):
+    processed, results, manager, journal = run(tmp_path, StubAutomator(), NUMBERS)
+    assert processed
+    assert sorted(results.succeeded) == NUMBERS
+    assert all(journal.is_completed(emed_no) for emed_no in NUMBERS)
+
+
+def test_transient_failure_is_retried(tmp_path):
+    processed, results, manager, journal = run(tmp_path, StubAutomator(flaky={"HAP0003"}), NUMBERS, retries=1)
+    assert sorted(results.succeeded) == NUMBERS
+    assert manager.stats["retries"] == 1
+    assert manager.stats["retry_succeeded"] == 1
+
+
+@pytest.mark.parametrize("workers, retries", [(1, 0), (1, 2), (2, 1)])
+def test_numbers_left_when_every_browser_is_lost_are_failed(tmp_path, monkeypatch, workers, retries):
+    monkeypatch.setattr(emedical, "MAX_WORKERS", 2)
+    processed, results, manager, journal = run(tmp_path, StubAutomator(lives=3), NUMBERS, workers, retries)
+    assert processed
+    assert len(results.succeeded) == 3 * workers
+    assert sorted(results.succeeded + results.failed) == NUMBERS
+    assert manager.workers_lost.is_set()
+    for emed_no in results.failed:
+        assert journal.state(emed_no) == CheckpointJournal.FAILED
+
+
+@pytest.mark.parametrize("status, skipped", [
+    ("submitted", True),
+    ("finalised", True),
+    ("not submitted", False),
+    ("unsubmitted", False),
+    ("exams completed: 501", False),
+    (None, False),
+])
+def test_skip_only_on_completed_status(monkeypatch, status, skipped):
+    automator = StubAutomator()
+    monkeypatch.setattr(automator.api_impl, "require_driver", lambda: FakeDriver(status))
+    if skipped:
+        with pytest.raises(CaseAlreadyCompleted):
+            automator._skip_if_completed("HAP1")
+    else:
+        automator._skip_if_completed("HAP1")
+
+
+
+def test_verify_case_with_several_tabs(monkeypatch):
+    automator = StubAutomator()
+    automator.pipeline_depth = 2
+    driver = FakeDriver(False)
+    monkeypatch.setattr(automator.api_impl, "require_driver", lambda: driver)
+    with pytest.raises(CaseMismatch):
+        automator._verify_case(" HAP1 ")
+    assert driver.args == ("hap1",)
+
+
+def test_verify_case_is_skipped_with_one_tab(monkeypatch):
+    automator = StubAutomator()
+    driver = FakeDriver(False)
+    monkeypatch.setattr(automator.api_impl, "require_driver", lambda: driver)
+    automator._verify_case("HAP1")
+    assert driver.args is None
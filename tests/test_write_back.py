@@ -0,0 +1,91 @@
+import functools
+import threading
+from time import monotonic, sleep
+
+from openpyxl import load_workbook
+
+import emedical
+from emedical import (
+    WRITE_BACK_FILL, WRITE_BACK_STATUS_HEADER, CheckpointJournal, EmedicalWorkflowManager, ExcelProcessor, FolderWatcher,
+    ResultWriter
+)
+from tests.stubs import Results, StubAutomator
+from tests.workbooks import write_rows, write_workbook
+
+
+def test_round_trip_skips_succeeded_rows(tmp_path):
+    path = tmp_path / "batch.xlsx"
+    write_workbook(path, ["HAP1", "HAP2", "HAP3"])
+    writer = ResultWriter()
+    for emed_no, source in ExcelProcessor().iter_sources([path]):
+        writer.record(emed_no, source, emed_no != "HAP2")
+    assert len(writer) == 3
+    assert writer.commit() == 3
+    assert len(writer) == 0
+
+    ws = load_workbook(path)["Cases"]
+    assert ws.cell(row=1, column=3).value == WRITE_BACK_STATUS_HEADER
+    assert [ws.cell(row=row, column=3).value for row in (2, 3, 4)] == ["succeeded", "failed", "succeeded"]
+    assert ws.cell(row=2, column=2).fill.fgColor.rgb == WRITE_BACK_FILL
+    # Filled rows are no longer eligible, so the next run only reads the failed one
+    assert [emed_no for emed_no, _ in ExcelProcessor().iter_sources([path])] == ["HAP2"]
+
+
+def test_rows_moved_since_reading_are_found_by_number(tmp_path):
+    path = tmp_path / "batch.xlsx"
+    write_workbook(path, ["HAP1", "HAP2", "HAP3"])
+    writer = ResultWriter()
+    for emed_no, source in ExcelProcessor().iter_sources([path]):
+        writer.record(emed_no, source, emed_no == "HAP1")
+    # Sorted in reverse and HAP2 deleted while the run was going
+    write_workbook(path, ["HAP3", "HAP1"])
+
+    assert writer.commit() == 2
+    ws = load_workbook(path)["Cases"]
+    rows = {ws.cell(row=row, column=2).value: ws.cell(row=row, column=3).value for row in (2, 3)}
+    assert rows == {"HAP3": "failed", "HAP1": "succeeded"}
+    assert ws.cell(row=3, column=2).fill.fgColor.rgb == WRITE_BACK_FILL
+    assert ws.cell(row=2, column=2).fill.fgColor.rgb != WRITE_BACK_FILL
+
+
+def test_numbers_under_every_header_column_are_written_back(tmp_path):
+    path = tmp_path / "tables.xlsx"
+    write_rows(path, [["eMedical No.", None, "eMedical No."], ["HAP1", None, "HAP2"]])
+    writer = ResultWriter()
+    for emed_no, source in ExcelProcessor().iter_sources([path]):
+        writer.record(emed_no, source, True)
+    assert writer.commit() == 2
+    ws = load_workbook(path)["Cases"]
+    assert ws.cell(row=2, column=1).fill.fgColor.rgb == WRITE_BACK_FILL
+    assert ws.cell(row=2, column=3).fill.fgColor.rgb == WRITE_BACK_FILL
+
+
+def _statuses(path, rows):
+    ws = load_workbook(path)["Cases"]
+    return [ws.cell(row=row, column=3).value for row in rows]
+
+
+def test_watch_mode_writes_back_while_running(tmp_path, monkeypatch):
+    monkeypatch.setattr(emedical, "WATCH_WRITE_BACK_INTERVAL", 0.05)
+    monkeypatch.setattr(emedical, "FolderWatcher", functools.partial(FolderWatcher, interval=0.01, debounce=0))
+    folder = tmp_path / "exports"
+    folder.mkdir()
+    write_workbook(folder / "a.xlsx", ["HAP1", "HAP2"])
+    journal = CheckpointJournal(tmp_path / "journal.jsonl")
+    manager = EmedicalWorkflowManager(ExcelProcessor(), StubAutomator(), journal)
+    Results(manager)
+    manager.result_writer = ResultWriter()
+    service = threading.Thread(target=manager.watch_folder, args=("user", "password", folder, True))
+    service.start()
+    try:
+        deadline = monotonic() + 10
+        while _statuses(folder / "a.xlsx", (2, 3)) != ["succeeded", "succeeded"] and monotonic() < deadline:
+            sleep(0.05)
+        # Written while the service still runs, not only when it stops
+        assert service.is_alive()
+        assert _statuses(folder / "a.xlsx", (2, 3)) == ["succeeded", "succeeded"]
+    finally:
+        manager.stop_workflow()
+        service.join(10)
+        emedical.stop_event.clear()
+        journal.close()
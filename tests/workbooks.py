@@ -0,0 +1,20 @@
+"""Workbooks in the layout the extractor expects, shared by the tests and benchmarks."""
+from openpyxl import Workbook
+from openpyxl.styles import Font
+
+
+def write_rows(path, rows, title="Cases"):
+    """Write the rows (None for an empty row) into one sheet, every value in black."""
+    wb = Workbook()
+    ws = wb.active
+    ws.title = title
+    for row_number, row in enumerate(rows, start=1):
+        for column, value in enumerate(row or (), start=1):
+            if value is not None:
+                # openpyxl's default font uses a theme colour, which the extractor treats as not black
+                ws.cell(row=row_number, column=column, value=value).font = Font(color="FF000000")
+    wb.save(path)
+
+
+def write_workbook(path, numbers):
+    write_rows(path, [["Name", "eMedical No."]] + [[f"Applicant {i}", emed_no] for i, emed_no in enumerate(numbers)])